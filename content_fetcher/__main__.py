@@ -1,90 +1,223 @@
-import requests
+import argparse
 import concurrent.futures
+import glob
 import os
 
-from rich.progress import Progress, DownloadColumn, BarColumn, TextColumn, TimeRemainingColumn, TransferSpeedColumn
-from rich.console import Console
-from .overall_speed_column import OverallSpeedColumn
-
-# Create a shared console and progress manager
-console = Console()
-progress = Progress(
-    TextColumn("[bold blue]{task.fields[filename]}", justify="right"),
-    BarColumn(),
-    DownloadColumn(),
-    TransferSpeedColumn(),
-    OverallSpeedColumn(),
-    TimeRemainingColumn(),
-    transient=False, # this keeps the progress bars after completion
-    console=console,
-)
+from .async_downloader import run_adaptive
+from .fileio import CHUNK_SIZE
+from .downloader import DOWNLOAD_URL, console, download_task, output_path, progress
+from .manifest import MANIFEST_NAME, RETRY_LIST_NAME, DownloadManifest
+from .rate_limit import ControlFileWatcher, rate_limits
 
 # DO NOT RAISE ABOVE 5 AS IT MIGHT CRASH THE SERVER
 max_workers = 3  # Change this to control the number of parallel downloads
 output_dir = "/media/biosdaddy/WD Red/archives/other/audio"
 input_file_name = "other_talks.txt"
-
-
-def download_file_with_speed(url, filepath):
-    try:
-        response = requests.get(url, stream=True, timeout=30)
-        response.raise_for_status()
-
-        total_size = int(response.headers.get('content-length', 0))
-        chunk_size = 8192  # 8 KB
-        filename = os.path.basename(filepath)
-
-        task_id = progress.add_task("download", filename=filename, total=total_size)
-
-
-        with open(filepath, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=chunk_size):
-                if chunk:
-                    f.write(chunk)
-                    progress.update(task_id, advance=len(chunk))
-
-        console.print(f"downloaded file {url}")
-
-        # remove the task from view
-        progress.remove_task(task_id)
-
-
-    except Exception as e:
-        console.print(f"Failed to download {url}: {e}")
-
-
-def download_task(ref_id):
-    url = f"https://media-archive.zmmapple.com/pages/download.php?direct=1&ref={ref_id}&ext=mp3"
-    file_name = f"{ref_id}.mp3"
-    file_path = os.path.join(output_dir, file_name)
-
-    download_file_with_speed(url, file_path)
+talk_ids_dir = "talk_ids"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Download talk audio from the media archive.")
+    parser.add_argument("--output-dir", default=output_dir, help="Directory to save the files.")
+    parser.add_argument(
+        "--input-file",
+        action="append",
+        default=None,
+        help=(
+            "File with one ref id per line (relative paths resolve from this package). "
+            f"Repeatable; defaults to {input_file_name}."
+        ),
+    )
+    parser.add_argument(
+        "--all-lists",
+        action="store_true",
+        help=f"Read every {talk_ids_dir}/*.txt list; ids in several lists are fetched once.",
+    )
+    parser.add_argument(
+        "--manifest",
+        default=None,
+        help=f"Download manifest path (default: <output-dir>/{MANIFEST_NAME}).",
+    )
+    parser.add_argument(
+        "--revalidate",
+        action="store_true",
+        help="Re-check completed files with conditional requests instead of skipping them.",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=("adaptive", "threads"),
+        default="adaptive",
+        help="adaptive: asyncio scheduler with AIMD concurrency; threads: fixed worker pool.",
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=max_workers,
+        help="Worker count for the threads engine, and the starting concurrency for adaptive.",
+    )
+    parser.add_argument(
+        "--min-concurrency",
+        type=int,
+        default=1,
+        help="Lowest concurrency the adaptive engine backs off to.",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=5,
+        help="Ceiling for the adaptive engine (the server has crashed above 5).",
+    )
+    parser.add_argument(
+        "--max-mbps",
+        type=float,
+        default=None,
+        help="Cap on total download bandwidth across all workers, in MB/s.",
+    )
+    parser.add_argument(
+        "--max-rps",
+        type=float,
+        default=None,
+        help="Cap on new requests per second across all workers.",
+    )
+    parser.add_argument(
+        "--control-file",
+        default=None,
+        help=(
+            "File with max_mbps=/max_rps= lines, re-read when it changes or on SIGHUP, "
+            "to adjust the caps while running. Missing keys fall back to the flags."
+        ),
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=CHUNK_SIZE // 1024,
+        help="Read/write buffer per worker in KiB; larger means fewer syscalls on fast links.",
+    )
+    parser.add_argument(
+        "--url-template",
+        default=DOWNLOAD_URL,
+        help="Download URL with a {ref_id} placeholder.",
+    )
+    args = parser.parse_args()
+    if not 1 <= args.min_concurrency <= args.max_concurrency:
+        parser.error("--min-concurrency must be between 1 and --max-concurrency")
+    for name in ("max_mbps", "max_rps"):
+        value = getattr(args, name)
+        if value is not None and value < 0:
+            parser.error(f"--{name.replace('_', '-')} must be >= 0")
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1 KiB")
+    return args
+
+
+def resolve_ref_files(args, base_dir):
+    ref_files = [os.path.join(base_dir, name) for name in args.input_file or []]
+    if args.all_lists:
+        ref_files.extend(sorted(glob.glob(os.path.join(base_dir, talk_ids_dir, "*.txt"))))
+    if not ref_files:
+        ref_files.append(os.path.join(base_dir, input_file_name))
+    return ref_files
+
+
+def read_ref_ids(ref_files):
+    """Read ids from every list in order, keeping the first occurrence of each."""
+    ref_ids = []
+    seen = set()
+    duplicates = 0
+    for ref_file in ref_files:
+        with open(ref_file, 'r') as f:
+            for line in f:
+                ref_id = line.strip()
+                if not ref_id.isdigit():
+                    continue
+                if ref_id in seen:
+                    duplicates += 1
+                    continue
+                seen.add(ref_id)
+                ref_ids.append(ref_id)
+    return ref_ids, duplicates
 
 
 def main():
+    args = parse_args()
+
     # This is the absolute path of the current package
     base_dir = os.path.dirname(os.path.abspath(__file__))
 
-    # Path to the file with ref values
-    #file_name = "test.txt" # should be in the webscraper directory
-    ref_file = os.path.join(base_dir, input_file_name)
+    # Path(s) to the file(s) with ref values
+    ref_files = resolve_ref_files(args, base_dir)
 
     # Directory to save the files
-    os.makedirs(output_dir, exist_ok=True)
-
-    # Read ref values from file
-    with open(ref_file, 'r') as f:
-        ref_ids = [line.strip() for line in f if line.strip().isdigit()]
-
-    console.print(f"Number of ref values (files to download): {len(ref_ids)}")
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest = DownloadManifest(args.manifest or os.path.join(args.output_dir, MANIFEST_NAME))
+
+    # Read ref values from file(s)
+    ref_ids, duplicates = read_ref_ids(ref_files)
+    if args.revalidate:
+        pending = ref_ids
+    else:
+        pending = [
+            ref_id
+            for ref_id in ref_ids
+            if not manifest.is_complete(ref_id, output_path(args.output_dir, ref_id))
+        ]
+
+    console.print(f"Number of ref values: {len(ref_ids)} from {len(ref_files)} list(s)")
+    if duplicates:
+        console.print(f"Skipped {duplicates} duplicate id(s) listed more than once")
+    console.print(f"Already complete: {len(ref_ids) - len(pending)}; files to download: {len(pending)}")
     console.print(
     "[bold]Filename         │ Progress │ Downloaded │ Curr Speed │ Avg Speed │ ETA[/bold]"
 )
 
-    with progress:
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            executor.map(download_task, ref_ids)
+    def fetch(ref_id):
+        return download_task(
+            ref_id,
+            args.output_dir,
+            args.url_template,
+            manifest=manifest,
+            revalidate=args.revalidate,
+            chunk_size=args.chunk_size * 1024,
+        )
+
+    limit_defaults = {"max_mbps": args.max_mbps, "max_rps": args.max_rps}
+    watcher = None
+    if args.control_file:
+        watcher = ControlFileWatcher(
+            args.control_file, rate_limits, limit_defaults, on_change=console.print
+        ).start()
+    else:
+        rate_limits.configure(**limit_defaults)
+        console.print(f"rate limits: {rate_limits.describe()}")
+
+    try:
+        with progress:
+            if args.engine == "adaptive":
+                run_adaptive(
+                    pending,
+                    fetch,
+                    initial=args.max_workers,
+                    minimum=args.min_concurrency,
+                    maximum=args.max_concurrency,
+                )
+            else:
+                with concurrent.futures.ThreadPoolExecutor(max_workers=args.max_workers) as executor:
+                    list(executor.map(fetch, pending))
+    finally:
+        if watcher:
+            watcher.stop()
+        manifest.compact()
+
+    failed = manifest.failed_ids(ref_ids)
+    retry_path = os.path.join(args.output_dir, RETRY_LIST_NAME)
+    with open(retry_path, 'w') as f:
+        f.writelines(f"{ref_id}\n" for ref_id in failed)
+    if failed:
+        console.print(
+            f"[bold red]{len(failed)} download(s) failed[/bold red]; "
+            f"retry with --input-file {retry_path}"
+        )
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
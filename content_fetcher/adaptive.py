@@ -0,0 +1,124 @@
+import asyncio
+import time
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on in-flight downloads, driven by download outcomes.
+
+    Every `window` healthy completions the limit grows by one (additive increase).
+    A 5xx, timeout or connection error, or a time-to-first-byte well above the
+    typical one (and at least `latency_slack` seconds slower), halves it
+    (multiplicative decrease). "Typical" is an exponentially weighted average
+    of recent TTFBs (weight `latency_alpha` per sample), so one lucky fast
+    response doesn't make every normal one after it look slow. If a window
+    finishes with lower aggregate throughput than the one before an increase,
+    that increase is undone: more parallelism is no longer buying anything.
+    """
+
+    def __init__(
+        self,
+        initial=2,
+        minimum=1,
+        maximum=5,
+        window=3,
+        backoff=0.5,
+        latency_tolerance=2.0,
+        latency_slack=0.25,
+        slowdown_tolerance=0.1,
+        latency_alpha=0.2,
+        on_change=None,
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = max(minimum, min(initial, maximum))
+        self.window = window
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.latency_slack = latency_slack
+        self.slowdown_tolerance = slowdown_tolerance
+        self.latency_alpha = latency_alpha
+        self.on_change = on_change
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+        self._baseline_latency = None
+        self._window_start = time.perf_counter()
+        self._window_bytes = 0
+        self._window_count = 0
+        self._previous_throughput = None
+        self._increased_last_window = False
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self, result):
+        async with self._cond:
+            self.in_flight -= 1
+            self._record(result)
+            self._cond.notify_all()
+
+    def _set_limit(self, limit, reason):
+        limit = max(self.minimum, min(int(limit), self.maximum))
+        if limit != self.limit:
+            self.limit = limit
+            if self.on_change:
+                self.on_change(limit, reason)
+        self._reset_window()
+
+    def _reset_window(self):
+        self._window_start = time.perf_counter()
+        self._window_bytes = 0
+        self._window_count = 0
+
+    def _record(self, result):
+        if result is None:
+            return
+        if result.congested:
+            self._increased_last_window = False
+            self._previous_throughput = None
+            self._set_limit(self.limit * self.backoff, f"server trouble: {result.error}")
+            return
+
+        latency = result.first_byte_seconds
+        if latency is not None:
+            baseline = self._baseline_latency
+            # Slow samples still move the baseline, so a lasting slowdown stops
+            # halving the limit once it has become the norm.
+            self._baseline_latency = latency if baseline is None else (
+                baseline + self.latency_alpha * (latency - baseline)
+            )
+            if (
+                baseline is not None
+                and latency > baseline * self.latency_tolerance
+                and latency - baseline > self.latency_slack
+            ):
+                self._increased_last_window = False
+                self._previous_throughput = None
+                self._set_limit(
+                    self.limit * self.backoff,
+                    f"slow response ({latency:.2f}s vs typical {baseline:.2f}s)",
+                )
+                return
+
+        self._window_bytes += result.bytes_downloaded
+        self._window_count += 1
+        if self._window_count < self.window:
+            return
+
+        elapsed = max(time.perf_counter() - self._window_start, 1e-6)
+        throughput = self._window_bytes / elapsed
+        previous = self._previous_throughput
+        if (
+            self._increased_last_window
+            and previous
+            and throughput < previous * (1 - self.slowdown_tolerance)
+        ):
+            self._increased_last_window = False
+            self._previous_throughput = throughput
+            self._set_limit(self.limit - 1, "throughput dropped after increase")
+            return
+
+        self._previous_throughput = throughput
+        self._increased_last_window = self.limit < self.maximum
+        self._set_limit(self.limit + 1, f"healthy ({throughput / (1024 * 1024):.2f} MB/s)")
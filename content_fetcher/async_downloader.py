@@ -0,0 +1,43 @@
+import asyncio
+import concurrent.futures
+
+from .adaptive import AdaptiveConcurrency
+from .downloader import console
+
+
+async def _download_one(ref_id, controller, fetch):
+    result = None
+    try:
+        # Transfers stay on the blocking requests path; asyncio only schedules them.
+        result = await asyncio.to_thread(fetch, ref_id)
+        return result
+    finally:
+        await controller.release(result)
+
+
+async def download_all(ref_ids, fetch, controller):
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(concurrent.futures.ThreadPoolExecutor(max_workers=controller.maximum))
+
+    tasks = []
+    for ref_id in ref_ids:
+        await controller.acquire()
+        tasks.append(asyncio.create_task(_download_one(ref_id, controller, fetch)))
+    return await asyncio.gather(*tasks)
+
+
+def run_adaptive(ref_ids, fetch, initial, minimum, maximum):
+    """Download every ref id with `fetch(ref_id) -> DownloadResult` under AIMD concurrency."""
+    def report(limit, reason):
+        console.print(f"[bold]concurrency -> {limit}[/bold] ({reason})")
+
+    async def runner():
+        controller = AdaptiveConcurrency(
+            initial=initial,
+            minimum=minimum,
+            maximum=maximum,
+            on_change=report,
+        )
+        return await download_all(ref_ids, fetch, controller)
+
+    return asyncio.run(runner())
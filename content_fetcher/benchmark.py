@@ -0,0 +1,159 @@
+import argparse
+import concurrent.futures
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from rich.table import Table
+
+from .async_downloader import run_adaptive
+from .downloader import console, download_task
+from .fileio import CHUNK_SIZE
+from .manifest import MANIFEST_NAME, DownloadManifest
+from .rate_limit import MB
+from .standin_server import add_server_arguments, server_argv
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Measure download throughput, tail latency and retries across concurrency settings."
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[1, 2, 3, 5],
+        help="Settings to compare: worker count for threads, ceiling for adaptive.",
+    )
+    parser.add_argument("--engine", choices=("adaptive", "threads"), default="threads")
+    parser.add_argument("--count", type=int, default=20, help="Downloads per setting.")
+    parser.add_argument("--retries", type=int, default=2, help="Extra rounds for failed ids (these resume from .part).")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE // 1024, help="Downloader buffer in KiB.")
+    parser.add_argument(
+        "--url-template",
+        default=None,
+        help="Benchmark an existing server instead of starting the stand-in (never production).",
+    )
+    add_server_arguments(parser)
+    return parser.parse_args()
+
+
+def start_standin(args):
+    """Start the stand-in server on a free port; returns (process, url_template)."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "content_fetcher.standin_server", "--port", "0", *server_argv(args)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    line = process.stdout.readline().strip()
+    if not line.startswith("serving "):
+        process.kill()
+        raise RuntimeError("stand-in server failed to start")
+    return process, line[len("serving "):]
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile; None for an empty list."""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run_setting(concurrency, args, url_template):
+    ref_ids = [str(ref_id) for ref_id in range(1, args.count + 1)]
+    with tempfile.TemporaryDirectory(prefix="fetch-bench-") as output_dir:
+        manifest = DownloadManifest(os.path.join(output_dir, MANIFEST_NAME))
+
+        def fetch(ref_id):
+            return download_task(
+                ref_id, output_dir, url_template, manifest=manifest, chunk_size=args.chunk_size * 1024
+            )
+
+        results = []
+        pending = ref_ids
+        start = time.perf_counter()
+        for _ in range(args.retries + 1):
+            if not pending:
+                break
+            if args.engine == "adaptive":
+                round_results = run_adaptive(
+                    pending, fetch, initial=min(2, concurrency), minimum=1, maximum=concurrency
+                )
+            else:
+                with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    round_results = list(executor.map(fetch, pending))
+            results.extend(round_results)
+            pending = [result.ref_id for result in round_results if not result.ok]
+        wall = time.perf_counter() - start
+
+    ok = [result for result in results if result.ok]
+    first_bytes = [r.first_byte_seconds for r in results if r.first_byte_seconds is not None]
+    latencies = [result.elapsed for result in ok]
+    return {
+        "concurrency": concurrency,
+        "wall": wall,
+        "mbps": sum(r.bytes_downloaded for r in results) / MB / wall if wall else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "ttfb_p99": percentile(first_bytes, 0.99),
+        "attempts": len(results),
+        "retried": len({r.ref_id for r in results if not r.ok}),
+        "congested": sum(1 for r in results if r.congested),
+        "gave_up": len(pending),
+    }
+
+
+def format_seconds(value):
+    return "-" if value is None else f"{value:.2f}s"
+
+
+def main():
+    args = parse_args()
+    process = None
+    url_template = args.url_template
+    if url_template is None:
+        process, url_template = start_standin(args)
+    console.print(f"benchmarking {url_template} ({args.engine} engine, {args.count} downloads per setting)")
+
+    rows = []
+    try:
+        for concurrency in args.concurrency:
+            # Keep the per-file download lines out of the report.
+            console.quiet = True
+            try:
+                rows.append(run_setting(concurrency, args, url_template))
+            finally:
+                console.quiet = False
+            console.print(f"concurrency {concurrency}: {rows[-1]['mbps']:.2f} MB/s")
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    table = Table(title="Download benchmark")
+    for column in ("concurrency", "MB/s", "p50", "p95", "p99", "TTFB p99",
+                   "attempts", "retried ids", "congested", "gave up"):
+        table.add_column(column, justify="right")
+    for row in rows:
+        table.add_row(
+            str(row["concurrency"]),
+            f"{row['mbps']:.2f}",
+            format_seconds(row["p50"]),
+            format_seconds(row["p95"]),
+            format_seconds(row["p99"]),
+            format_seconds(row["ttfb_p99"]),
+            str(row["attempts"]),
+            str(row["retried"]),
+            str(row["congested"]),
+            str(row["gave_up"]),
+        )
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
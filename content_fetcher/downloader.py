@@ -0,0 +1,234 @@
+import hashlib
+import http.client
+import os
+import time
+from dataclasses import dataclass
+
+import requests
+import urllib3
+from rich.progress import Progress, DownloadColumn, BarColumn, TextColumn, TimeRemainingColumn, TransferSpeedColumn
+from rich.console import Console
+from .fileio import CHUNK_SIZE, copy_stream, preallocate
+from .manifest import STATUS_COMPLETE, STATUS_FAILED, STATUS_PARTIAL
+from .overall_speed_column import OverallSpeedColumn
+from .rate_limit import rate_limits
+
+DOWNLOAD_URL = "https://media-archive.zmmapple.com/pages/download.php?direct=1&ref={ref_id}&ext=mp3"
+
+# Create a shared console and progress manager
+console = Console()
+progress = Progress(
+    TextColumn("[bold blue]{task.fields[filename]}", justify="right"),
+    BarColumn(),
+    DownloadColumn(),
+    TransferSpeedColumn(),
+    OverallSpeedColumn(),
+    TimeRemainingColumn(),
+    transient=False, # this keeps the progress bars after completion
+    console=console,
+)
+
+
+@dataclass
+class DownloadResult:
+    ref_id: str
+    ok: bool
+    bytes_downloaded: int = 0
+    elapsed: float = 0.0
+    # Seconds until response headers arrived; None if the request never got that far.
+    first_byte_seconds: float = None
+    status_code: int = None
+    error: str = None
+    # True when the failure suggests the server is overloaded (5xx, 429, timeouts).
+    congested: bool = False
+
+
+def is_congestion_error(exc):
+    # copy_stream reads response.raw directly, so a drop or read timeout mid-body
+    # surfaces as a urllib3/http.client error rather than requests' wrappers.
+    if isinstance(exc, (
+        requests.exceptions.Timeout,
+        requests.exceptions.ConnectionError,
+        urllib3.exceptions.HTTPError,
+        http.client.IncompleteRead,
+    )):
+        return True
+    response = getattr(exc, "response", None)
+    return response is not None and (response.status_code >= 500 or response.status_code == 429)
+
+
+def parse_content_range(value):
+    """Return (start, total) from a 'bytes start-end/total' header; total may be None."""
+    if not value or not value.startswith("bytes "):
+        return None, None
+    span, _, total = value[len("bytes "):].partition("/")
+    start = span.split("-", 1)[0]
+    return (
+        int(start) if start.isdigit() else None,
+        int(total) if total.isdigit() else None,
+    )
+
+
+def sha256_of_file(path, hasher=None, block_size=1024 * 1024):
+    hasher = hasher or hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            hasher.update(block)
+    return hasher
+
+
+def validators(response):
+    return {
+        "etag": response.headers.get("etag"),
+        "last_modified": response.headers.get("last-modified"),
+    }
+
+
+def build_request_headers(offset, entry, revalidate):
+    headers = {}
+    entry = entry or {}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        # Only resume if the file is still the one the .part came from;
+        # otherwise the server answers 200 with the whole new file.
+        if entry.get("etag") or entry.get("last_modified"):
+            headers["If-Range"] = entry.get("etag") or entry["last_modified"]
+    elif revalidate and entry.get("status") == STATUS_COMPLETE:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def download_file_with_speed(
+    url, filepath, ref_id=None, manifest=None, revalidate=False, chunk_size=CHUNK_SIZE
+):
+    start = time.perf_counter()
+    ref_id = ref_id or os.path.basename(filepath)
+    result = DownloadResult(ref_id=ref_id, ok=False)
+    entry = manifest.get(ref_id) if manifest else None
+    # Bytes land in <file>.part and are renamed once complete, so an interrupted
+    # download is never mistaken for a finished one and can resume with Range.
+    part_path = filepath + ".part"
+    try:
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = build_request_headers(offset, entry, revalidate and os.path.exists(filepath))
+        rate_limits.requests.acquire()
+        # Time the server, not our own rate limiter.
+        request_start = time.perf_counter()
+        response = requests.get(url, stream=True, timeout=30, headers=headers)
+        result.first_byte_seconds = time.perf_counter() - request_start
+        result.status_code = response.status_code
+
+        if response.status_code == 304:
+            response.close()
+            if manifest:
+                manifest.record(ref_id, STATUS_COMPLETE)
+            console.print(f"unchanged {url}")
+            result.ok = True
+            return result
+
+        if response.status_code == 416 and offset:
+            # Nothing left to fetch, or the .part is longer than the file now is.
+            _, total_size = parse_content_range(response.headers.get("content-range"))
+            response.close()
+            if total_size == offset:
+                digest = sha256_of_file(part_path).hexdigest()
+                os.replace(part_path, filepath)
+                if manifest:
+                    manifest.record(ref_id, STATUS_COMPLETE, size=total_size, sha256=digest)
+                console.print(f"already complete {url}")
+                result.ok = True
+                return result
+            os.remove(part_path)
+            raise IOError(f"stale partial file removed ({offset} bytes); retry to restart")
+        response.raise_for_status()
+
+        hasher = hashlib.sha256()
+        if response.status_code == 206:
+            range_start, total_size = parse_content_range(response.headers.get("content-range"))
+            if range_start != offset:
+                raise IOError(f"server resumed at byte {range_start}, expected {offset}")
+            mode = 'ab'
+            sha256_of_file(part_path, hasher)
+        else:
+            # Server ignored the Range request (or the file changed); start over.
+            offset = 0
+            total_size = int(response.headers.get('content-length', 0)) or None
+            mode = 'wb'
+        if response.headers.get('content-encoding', 'identity') != 'identity':
+            # We read the raw stream, so decode here; content-length is the encoded size.
+            response.raw.decode_content = True
+            total_size = None
+        if manifest:
+            manifest.record(ref_id, STATUS_PARTIAL, size=total_size, **validators(response))
+
+        filename = os.path.basename(filepath)
+
+        task_id = progress.add_task("download", filename=filename, total=total_size, completed=offset)
+
+
+        try:
+            # Unbuffered: copy_stream already writes whole chunks, one syscall each.
+            with open(part_path, mode, buffering=0) as f:
+                if total_size:
+                    preallocate(f.fileno(), offset, total_size - offset)
+
+                def advance(count):
+                    result.bytes_downloaded += count
+                    progress.update(task_id, advance=count)
+
+                copy_stream(response.raw, f, hasher, advance, chunk_size=chunk_size)
+        finally:
+            # remove the task from view
+            progress.remove_task(task_id)
+            response.close()
+
+        on_disk = os.path.getsize(part_path)
+        if total_size is not None and on_disk != total_size:
+            raise IOError(f"incomplete download: {on_disk} of {total_size} bytes, kept {part_path}")
+        os.replace(part_path, filepath)
+        if manifest:
+            manifest.record(ref_id, STATUS_COMPLETE, size=on_disk, sha256=hasher.hexdigest())
+
+        resumed = f" (resumed at byte {offset})" if offset else ""
+        console.print(f"downloaded file {url}{resumed}")
+        result.ok = True
+
+
+    except Exception as e:
+        console.print(f"Failed to download {url}: {e}")
+        result.error = str(e)
+        result.congested = is_congestion_error(e)
+        if manifest:
+            manifest.record(ref_id, STATUS_FAILED, error=result.error)
+
+    finally:
+        result.elapsed = time.perf_counter() - start
+    return result
+
+
+def output_path(output_dir, ref_id):
+    return os.path.join(output_dir, f"{ref_id}.mp3")
+
+
+def download_task(
+    ref_id,
+    output_dir,
+    url_template=DOWNLOAD_URL,
+    manifest=None,
+    revalidate=False,
+    chunk_size=CHUNK_SIZE,
+):
+    url = url_template.format(ref_id=ref_id)
+    file_path = output_path(output_dir, ref_id)
+
+    return download_file_with_speed(
+        url,
+        file_path,
+        ref_id=ref_id,
+        manifest=manifest,
+        revalidate=revalidate,
+        chunk_size=chunk_size,
+    )
@@ -0,0 +1,74 @@
+import json
+import os
+import threading
+import time
+
+MANIFEST_NAME = "download_manifest.jsonl"
+RETRY_LIST_NAME = "failed_ids.txt"
+
+STATUS_PARTIAL = "partial"
+STATUS_COMPLETE = "complete"
+STATUS_FAILED = "failed"
+
+
+class DownloadManifest:
+    """Per-ref_id download record: size, ETag/Last-Modified, sha256 and status.
+
+    Stored as JSON lines and only ever appended to while downloading, so a
+    crash loses at most the line being written; the last line for an id wins.
+    `compact()` rewrites it with one line per id.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn last line from an interrupted run.
+                        continue
+                    self.entries[entry["ref_id"]] = entry
+
+    def get(self, ref_id):
+        return self.entries.get(ref_id)
+
+    def is_complete(self, ref_id, filepath):
+        entry = self.entries.get(ref_id)
+        return (
+            entry is not None
+            and entry.get("status") == STATUS_COMPLETE
+            and os.path.exists(filepath)
+            and os.path.getsize(filepath) == entry.get("size")
+        )
+
+    def record(self, ref_id, status, **fields):
+        with self._lock:
+            entry = dict(self.entries.get(ref_id, {}))
+            entry.update(fields)
+            entry.update(ref_id=ref_id, status=status, updated=int(time.time()))
+            if status != STATUS_FAILED:
+                entry.pop("error", None)
+            self.entries[ref_id] = entry
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, sort_keys=True) + "\n")
+            return entry
+
+    def failed_ids(self, ref_ids=None):
+        ids = self.entries if ref_ids is None else ref_ids
+        return [
+            ref_id
+            for ref_id in ids
+            if self.entries.get(ref_id, {}).get("status") == STATUS_FAILED
+        ]
+
+    def compact(self):
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for ref_id in sorted(self.entries, key=lambda value: (len(value), value)):
+                    f.write(json.dumps(self.entries[ref_id], sort_keys=True) + "\n")
+            os.replace(tmp_path, self.path)
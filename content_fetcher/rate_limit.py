@@ -0,0 +1,137 @@
+import os
+import signal
+import threading
+import time
+
+MB = 1024 * 1024
+
+
+class TokenBucket:
+    """Thread-safe token bucket; a rate of None or 0 means unlimited.
+
+    Callers may take more than is available: the balance goes negative and the
+    caller sleeps off the debt, so large chunks are still paced correctly.
+    """
+
+    def __init__(self, rate=None, burst_seconds=1.0):
+        self._lock = threading.Lock()
+        self.burst_seconds = burst_seconds
+        self.rate = None
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill()
+            self.rate = rate or None
+            self._tokens = min(self._tokens, self._capacity()) if self.rate else 0.0
+
+    def _capacity(self):
+        return self.rate * self.burst_seconds
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate:
+            self._tokens = min(self._capacity(), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount=1):
+        with self._lock:
+            if not self.rate:
+                return
+            self._refill()
+            self._tokens -= amount
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class RateLimits:
+    """Bytes/sec and requests/sec buckets shared by every download worker."""
+
+    def __init__(self):
+        self.bytes = TokenBucket()
+        self.requests = TokenBucket()
+
+    def configure(self, max_mbps=None, max_rps=None):
+        self.bytes.set_rate(max_mbps * MB if max_mbps else None)
+        self.requests.set_rate(max_rps)
+
+    def describe(self):
+        mbps = f"{self.bytes.rate / MB:g} MB/s" if self.bytes.rate else "unlimited MB/s"
+        rps = f"{self.requests.rate:g} req/s" if self.requests.rate else "unlimited req/s"
+        return f"{mbps}, {rps}"
+
+
+rate_limits = RateLimits()
+
+
+def read_control_file(path):
+    """Parse `max_mbps=<float>` / `max_rps=<float>` lines; 0 or blank means unlimited.
+
+    Raises ValueError for values that are not numbers or are negative, like the CLI.
+    """
+    values = {}
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if not line or "=" not in line:
+                continue
+            key, value = (part.strip() for part in line.split("=", 1))
+            if key in ("max_mbps", "max_rps"):
+                values[key] = float(value) if value else None
+                if values[key] is not None and values[key] < 0:
+                    raise ValueError(f"{key} must be >= 0, got {value}")
+    return values
+
+
+class ControlFileWatcher:
+    """Re-apply limits when the control file changes (polled) or on SIGHUP."""
+
+    def __init__(self, path, limits, defaults, on_change=None, interval=2.0):
+        self.path = path
+        self.limits = limits
+        self.defaults = defaults
+        self.on_change = on_change
+        self.interval = interval
+        self._mtime = None
+        self._reload = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        if hasattr(signal, "SIGHUP") and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, lambda *_: self._reload.set())
+        self.apply(force=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def apply(self, force=False):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if not force and mtime == self._mtime:
+            return
+        self._mtime = mtime
+        settings = dict(self.defaults)
+        if mtime is not None:
+            try:
+                settings.update(read_control_file(self.path))
+            except (OSError, ValueError) as exc:
+                if self.on_change:
+                    self.on_change(f"ignoring control file {self.path}: {exc}")
+                return
+        self.limits.configure(**settings)
+        if self.on_change:
+            self.on_change(f"rate limits -> {self.limits.describe()}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            forced = self._reload.wait(self.interval)
+            self._reload.clear()
+            self.apply(force=forced)
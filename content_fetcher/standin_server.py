@@ -0,0 +1,231 @@
+import argparse
+import functools
+import random
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from .rate_limit import MB, TokenBucket
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, no CRC/padding: 417-byte frames.
+MP3_FRAME_HEADER = bytes.fromhex("fffb9000")
+MP3_FRAME_SIZE = 417
+ID3_HEADER = b"ID3\x04\x00\x00\x00\x00\x00\x00"
+WRITE_SIZE = 64 * 1024
+
+
+@functools.lru_cache(maxsize=32)
+def synthetic_mp3(ref_id, mean_size):
+    """Deterministic MP3-framed payload for a ref id, so retries and Range requests agree."""
+    rng = random.Random(int(ref_id))
+    # Sizes vary between 0.5x and 1.5x the mean, like real talks.
+    frames = max(1, int(mean_size * rng.uniform(0.5, 1.5)) // MP3_FRAME_SIZE)
+    body = rng.randbytes(frames * (MP3_FRAME_SIZE - len(MP3_FRAME_HEADER)))
+    step = MP3_FRAME_SIZE - len(MP3_FRAME_HEADER)
+    payload = bytearray(ID3_HEADER)
+    for i in range(frames):
+        payload += MP3_FRAME_HEADER
+        payload += body[i * step:(i + 1) * step]
+    return bytes(payload)
+
+
+def parse_range(value, size):
+    """Return (start, end) for a single 'bytes=start-[end]' range, or None to send everything."""
+    if not value or not value.startswith("bytes=") or "," in value:
+        return None
+    start, _, end = value[len("bytes="):].partition("-")
+    if not start.isdigit():
+        return None
+    end = int(end) if end.isdigit() else size - 1
+    return int(start), min(end, size - 1)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "StandInMediaArchive/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        ref_id = parse_qs(url.query).get("ref", [""])[0]
+        if not url.path.endswith("/download.php") or not ref_id.isdigit():
+            self.send_error(404)
+            return
+
+        with server.lock:
+            server.active += 1
+            overloaded = server.max_connections and server.active > server.max_connections
+        try:
+            time.sleep(server.latency + server.rng.uniform(0, server.jitter))
+            if overloaded or server.rng.random() < server.error_rate:
+                server.count("errors")
+                self.send_error(503, "Service Unavailable")
+                return
+            self._send_payload(ref_id)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _send_payload(self, ref_id):
+        server = self.server
+        payload = synthetic_mp3(ref_id, server.mean_size)
+        size = len(payload)
+        etag = f'"{ref_id}-{size}"'
+
+        if self.headers.get("If-None-Match") == etag:
+            server.count("not_modified")
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        span = parse_range(self.headers.get("Range"), size)
+        if_range = self.headers.get("If-Range")
+        if span and if_range and if_range not in (etag, server.last_modified):
+            span = None
+        if span and span[0] >= size:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end = span or (0, size - 1)
+        self.send_response(206 if span else 200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", server.last_modified)
+        if span:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            server.count("ranges")
+        self.end_headers()
+
+        body = memoryview(payload)[start:end + 1]
+        if server.rng.random() < server.drop_rate:
+            # Cut the connection somewhere in the body, like a flaky upstream.
+            body = body[:server.rng.randrange(len(body))] if len(body) > 1 else body[:0]
+            self.close_connection = True
+            server.count("drops")
+        connection_limit = TokenBucket(server.connection_rate, burst_seconds=0.1)
+        try:
+            for offset in range(0, len(body), WRITE_SIZE):
+                chunk = body[offset:offset + WRITE_SIZE]
+                connection_limit.acquire(len(chunk))
+                server.bandwidth.acquire(len(chunk))
+                self.wfile.write(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+            return
+        server.count("served")
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, mean_size=3 * MB, latency=0.0, jitter=0.0, mbps=None,
+                 total_mbps=None, drop_rate=0.0, error_rate=0.0, max_connections=None,
+                 seed=0, verbose=False):
+        super().__init__(address, StandInHandler)
+        self.mean_size = mean_size
+        self.latency = latency
+        self.jitter = jitter
+        self.connection_rate = mbps * MB if mbps else None
+        self.bandwidth = TokenBucket(total_mbps * MB if total_mbps else None)
+        self.drop_rate = drop_rate
+        self.error_rate = error_rate
+        self.max_connections = max_connections
+        self.rng = random.Random(seed)
+        self.verbose = verbose
+        self.last_modified = formatdate(time.time(), usegmt=True)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.stats = {"served": 0, "ranges": 0, "drops": 0, "errors": 0, "not_modified": 0}
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+
+def add_server_arguments(parser):
+    group = parser.add_argument_group("stand-in server")
+    group.add_argument("--size-mb", type=float, default=3.0, help="Mean payload size in MB.")
+    group.add_argument("--latency", type=float, default=0.0, help="Seconds before response headers.")
+    group.add_argument("--jitter", type=float, default=0.0, help="Extra random latency, up to this many seconds.")
+    group.add_argument("--mbps", type=float, default=None, help="Bandwidth cap per connection, MB/s.")
+    group.add_argument("--total-mbps", type=float, default=None, help="Bandwidth cap across all connections, MB/s.")
+    group.add_argument("--drop-rate", type=float, default=0.0, help="Fraction of responses cut off mid-body.")
+    group.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503.")
+    group.add_argument(
+        "--max-connections",
+        type=int,
+        default=None,
+        help="Answer 503 beyond this many concurrent requests (the real server falls over above 5).",
+    )
+    group.add_argument("--seed", type=int, default=0, help="Seed for injected faults.")
+    return group
+
+
+SERVER_OPTIONS = (
+    "size_mb", "latency", "jitter", "mbps", "total_mbps",
+    "drop_rate", "error_rate", "max_connections", "seed",
+)
+
+
+def server_argv(args):
+    """Turn parsed server options back into command-line flags for a subprocess."""
+    argv = []
+    for name in SERVER_OPTIONS:
+        value = getattr(args, name)
+        if value is not None:
+            argv += [f"--{name.replace('_', '-')}", str(value)]
+    return argv
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local stand-in for the media archive: synthetic MP3s at /pages/download.php?direct=1&ref=<id>."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--verbose", action="store_true", help="Log every request.")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = StandInServer(
+        (args.host, args.port),
+        mean_size=int(args.size_mb * MB),
+        latency=args.latency,
+        jitter=args.jitter,
+        mbps=args.mbps,
+        total_mbps=args.total_mbps,
+        drop_rate=args.drop_rate,
+        error_rate=args.error_rate,
+        max_connections=args.max_connections,
+        seed=args.seed,
+        verbose=args.verbose,
+    )
+    host, port = server.server_address[:2]
+    print(
+        f"serving http://{host}:{port}/pages/download.php?direct=1&ref={{ref_id}}&ext=mp3",
+        flush=True,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"stats: {server.stats}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
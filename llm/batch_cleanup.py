@@ -8,9 +8,40 @@ import time
 import urllib.error
 import urllib.request
 
+import near_duplicates
+from token_counter import (
+    CONTEXT_SIZES,
+    OUTPUT_RATIO,
+    PROMPT_OVERHEAD,
+    TOKENIZER_ENV,
+    TokenCounter,
+    add_manifest_arguments,
+    context_needed,
+    fit_context,
+    resolve_inputs,
+)
+
 DEFAULT_TIMEOUT = 300
+# Loading a 70B model from disk can take minutes on a cold machine.
+DEFAULT_LOAD_TIMEOUT = 900
+CLUSTERS_NAME = "near_duplicate_clusters.json"
+
+
+def ollama_request(host, path, payload=None, timeout=30):
+    """POST `payload` (or GET when None) to the Ollama API and decode the JSON reply."""
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    req = urllib.request.Request(
+        f"{host.rstrip('/')}{path}",
+        data=data,
+        headers={"Content-Type": "application/json"},
+        method="GET" if payload is None else "POST",
+    )
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        body = resp.read()
+    return json.loads(body.decode("utf-8"))
+
 
-def call_ollama(host, model, text, timeout, keep_alive):
+def call_ollama(host, model, text, timeout, keep_alive, num_ctx=None):
     payload = {
         "model": model,
         "prompt": text,
@@ -18,16 +49,9 @@ def call_ollama(host, model, text, timeout, keep_alive):
     }
     if keep_alive:
         payload["keep_alive"] = keep_alive
-    data = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(
-        f"{host.rstrip('/')}/api/generate",
-        data=data,
-        headers={"Content-Type": "application/json"},
-        method="POST",
-    )
-    with urllib.request.urlopen(req, timeout=timeout) as resp:
-        body = resp.read()
-    decoded = json.loads(body.decode("utf-8"))
+    if num_ctx:
+        payload["options"] = {"num_ctx": num_ctx}
+    decoded = ollama_request(host, "/api/generate", payload, timeout)
     response = decoded.get("response", "")
     stats = {
         "prompt_eval_count": decoded.get("prompt_eval_count"),
@@ -35,10 +59,185 @@ def call_ollama(host, model, text, timeout, keep_alive):
         "eval_count": decoded.get("eval_count"),
         "eval_duration": decoded.get("eval_duration"),
         "total_duration": decoded.get("total_duration"),
+        "load_duration": decoded.get("load_duration"),
+        "num_ctx": num_ctx,
     }
     return response, stats
 
 
+def load_model(host, model, keep_alive, timeout, num_ctx=None):
+    """Load `model` into memory without generating anything (an empty prompt)."""
+    payload = {"model": model, "stream": False}
+    if keep_alive:
+        payload["keep_alive"] = keep_alive
+    if num_ctx:
+        payload["options"] = {"num_ctx": num_ctx}
+    ollama_request(host, "/api/generate", payload, timeout)
+
+
+def unload_model(host, model, timeout):
+    ollama_request(host, "/api/generate", {"model": model, "keep_alive": 0, "stream": False}, timeout)
+
+
+def resident_model(host, model, timeout=30):
+    """The /api/ps entry for `model`, or None if it is not loaded."""
+    names = {model, f"{model}:latest"}
+    for entry in ollama_request(host, "/api/ps", timeout=timeout).get("models") or []:
+        if entry.get("name") in names or entry.get("model") in names:
+            return entry
+    return None
+
+
+def warm_up(args, totals, num_ctx=None, label="warmup"):
+    """Load the model outside any timed request and confirm it is resident.
+    The load time goes to totals["load_seconds"]; returns False on failure."""
+    start = time.perf_counter()
+    print(f"{label}: loading {args.model}" + (f" num_ctx={num_ctx}" if num_ctx else ""), file=sys.stderr)
+    try:
+        call_with_heartbeat(
+            lambda: load_model(args.host, args.model, args.keep_alive, args.load_timeout, num_ctx),
+            args.heartbeat_seconds,
+            label,
+        )
+        entry = resident_model(args.host, args.model)
+    except (urllib.error.URLError, TimeoutError, ValueError) as exc:
+        print(f"error: {label}: {exc}", file=sys.stderr)
+        return False
+    elapsed = time.perf_counter() - start
+    totals["load_seconds"] += elapsed
+    totals["loads"] += 1
+    if entry is None:
+        print(f"note: {label}: {args.model} loaded but not listed by /api/ps", file=sys.stderr)
+        return True
+    parts = [f"load_s={elapsed:.2f}"]
+    if entry.get("size_vram") is not None:
+        parts.append(f"vram={entry['size_vram'] / 1024 ** 3:.1f}GiB")
+    if entry.get("size") and entry.get("size_vram") is not None and entry["size_vram"] < entry["size"]:
+        # Part of the model spilled to system RAM; expect much lower tok/s.
+        parts.append(f"offloaded={(entry['size'] - entry['size_vram']) / 1024 ** 3:.1f}GiB")
+    if entry.get("expires_at"):
+        parts.append(f"expires={entry['expires_at']}")
+    print(f"{label}: {args.model} resident, {', '.join(parts)}", file=sys.stderr)
+    return True
+
+
+def keep_warm(args, totals, state, num_ctx):
+    """Between files: reload when the next file needs a different num_ctx
+    (Ollama would otherwise reload inside its timed request), and every
+    --residency-check-seconds make sure the model has not been evicted.
+    `state` only changes when a load succeeds, so a failed one is retried
+    before the next file."""
+    now = time.perf_counter()
+    if num_ctx and num_ctx != state["num_ctx"]:
+        if not warm_up(args, totals, num_ctx, "resize"):
+            print(f"note: keeping num_ctx={state['num_ctx']} as the resident context", file=sys.stderr)
+            return
+    elif args.residency_check_seconds and now - state["checked"] >= args.residency_check_seconds:
+        try:
+            resident = resident_model(args.host, args.model) is not None
+        except (urllib.error.URLError, TimeoutError, ValueError) as exc:
+            print(f"note: residency check failed: {exc}", file=sys.stderr)
+            resident = True
+        if not resident:
+            print(f"note: {args.model} is no longer resident", file=sys.stderr)
+            if not warm_up(args, totals, state["num_ctx"], "reload"):
+                return
+    else:
+        return
+    state["num_ctx"] = num_ctx or state["num_ctx"]
+    state["checked"] = time.perf_counter()
+
+
+def context_for(tokens, args):
+    """num_ctx for cleaning `tokens` input tokens: plus the expected output,
+    rounded up to one of --ctx-sizes so Ollama only reloads for a few sizes.
+    Returns (num_ctx, needed); num_ctx is None when even the largest is too small."""
+    needed = context_needed(tokens, args.output_ratio, args.prompt_overhead)
+    num_ctx = fit_context(needed, args.ctx_sizes)
+    if num_ctx is not None and args.sticky_ctx:
+        num_ctx = args.sticky_ctx.round_up(num_ctx)
+    return num_ctx, needed
+
+
+class StickyContext:
+    """Largest num_ctx handed out so far, for callers that cannot sort files
+    with order_by_context (the streaming pipeline). Rounding every request up
+    to it means Ollama reloads only when a larger transcript arrives, not
+    whenever consecutive sizes differ, at the cost of KV cache for the rest."""
+
+    def __init__(self):
+        self.num_ctx = 0
+        self._lock = threading.Lock()
+
+    def round_up(self, num_ctx):
+        with self._lock:
+            self.num_ctx = max(self.num_ctx, num_ctx)
+            return self.num_ctx
+
+
+class ThroughputModel:
+    """Prefill and generation tok/s learned online from Ollama's
+    prompt_eval_*/eval_* stats, used to size each request's timeout.
+
+    Until `min_samples` requests have completed, the fixed fallback is used.
+    Safe to share between the pipeline's cleanup threads.
+    """
+
+    def __init__(self, fallback, safety, floor, cap, alpha=0.3, min_samples=2):
+        self.fallback = fallback
+        self.safety = safety
+        self.floor = floor
+        self.cap = cap
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.prefill_tps = None
+        self.gen_tps = None
+        self.samples = 0
+        self._lock = threading.Lock()
+
+    def _update(self, current, count, duration_ns):
+        if not count or not duration_ns:
+            return current
+        rate = count / (duration_ns / 1e9)
+        return rate if current is None else (1 - self.alpha) * current + self.alpha * rate
+
+    def observe(self, stats):
+        if not stats:
+            return
+        with self._lock:
+            self.prefill_tps = self._update(
+                self.prefill_tps, stats.get("prompt_eval_count"), stats.get("prompt_eval_duration")
+            )
+            self.gen_tps = self._update(self.gen_tps, stats.get("eval_count"), stats.get("eval_duration"))
+            if self.prefill_tps and self.gen_tps:
+                self.samples += 1
+
+    def predict(self, prompt_tokens, output_tokens):
+        """Expected seconds for a request, or None until enough has been seen."""
+        with self._lock:
+            if self.samples < self.min_samples:
+                return None
+            return prompt_tokens / self.prefill_tps + output_tokens / self.gen_tps
+
+    def timeout(self, prompt_tokens, output_tokens, attempt=1):
+        """Predicted time x safety factor, doubled for each retry, within
+        [floor, cap]; the fixed fallback until rates are known."""
+        predicted = self.predict(prompt_tokens, output_tokens)
+        if predicted is None:
+            return self.fallback
+        return min(self.cap, max(self.floor, predicted * self.safety * 2 ** (attempt - 1)))
+
+
+def order_by_context(input_paths, args):
+    """Group files by the num_ctx they will get, smallest first, so the model
+    is reloaded once per size instead of whenever consecutive files differ.
+    Returns (ordered paths, {path: num_ctx or None})."""
+    sizes = {}
+    for path, _, tokens in args.token_counter.count_files(input_paths):
+        sizes[path] = fit_context(context_needed(tokens, args.output_ratio, args.prompt_overhead), args.ctx_sizes)
+    return sorted(input_paths, key=lambda path: (sizes[path] is None, sizes[path] or 0)), sizes
+
+
 def unwrap_text(text):
     paragraphs = []
     current = []
@@ -70,20 +269,13 @@ def build_output_path(input_path, input_dir, output_dir, ext):
     return os.path.join(output_dir, rel_dir, out_name)
 
 
-def iter_input_files(input_dir, ext):
-    for root, _, files in os.walk(input_dir):
-        for name in sorted(files):
-            if ext and not name.endswith(ext):
-                continue
-            yield os.path.join(root, name)
-
-
 def main():
     parser = argparse.ArgumentParser(
         description="Batch-clean text files using an Ollama model."
     )
-    parser.add_argument("--input-dir", required=True, help="Directory with input files.")
+    parser.add_argument("--input-dir", default=None, help="Directory with input files.")
     parser.add_argument("--output-dir", required=True, help="Directory for output files.")
+    add_manifest_arguments(parser)
     parser.add_argument(
         "--model",
         required=True,
@@ -129,22 +321,153 @@ def main():
         default=30,
         help="Seconds between heartbeat logs while waiting on a request (default: 30, 0 to disable).",
     )
+    parser.add_argument(
+        "--near-dup-threshold",
+        type=float,
+        default=None,
+        help="Cluster transcripts whose 5-word shingles overlap at least this much "
+             "(Jaccard, e.g. 0.8) and clean only one per cluster (default: off).",
+    )
+    parser.add_argument(
+        "--clusters-file",
+        default=None,
+        help=f"Where to record cluster membership (default: <output-dir>/{CLUSTERS_NAME}).",
+    )
+    context = parser.add_argument_group("per-request context size")
+    context.add_argument(
+        "--dynamic-ctx",
+        action="store_true",
+        help="Send options.num_ctx sized to each file instead of using the Modelfile's, "
+             "and fail files that cannot fit rather than letting Ollama truncate them.",
+    )
+    context.add_argument(
+        "--ctx-sizes",
+        default=",".join(str(size) for size in CONTEXT_SIZES),
+        help="Comma-separated num_ctx values requests are rounded up to.",
+    )
+    context.add_argument(
+        "--output-ratio",
+        type=float,
+        default=OUTPUT_RATIO,
+        help="Expected output tokens per input token.",
+    )
+    context.add_argument(
+        "--prompt-overhead",
+        type=int,
+        default=PROMPT_OVERHEAD,
+        help="Tokens of Modelfile system prompt and template per request.",
+    )
+    context.add_argument(
+        "--tokenizer",
+        default=os.environ.get(TOKENIZER_ENV),
+        help=f"Llama 3.1 tokenizer.model for exact input sizes (default: ${TOKENIZER_ENV}; else words x 4/3).",
+    )
+    timeouts = parser.add_argument_group("adaptive timeouts")
+    timeouts.add_argument(
+        "--adaptive-timeout",
+        action="store_true",
+        help="Size each request's timeout from its input and the tok/s seen so far "
+             "(--timeout is used until two requests have finished).",
+    )
+    timeouts.add_argument(
+        "--timeout-safety",
+        type=float,
+        default=2.0,
+        help="Multiple of the predicted time to wait before giving up (doubled per retry).",
+    )
+    timeouts.add_argument("--timeout-floor", type=int, default=60, help="Shortest adaptive timeout in seconds.")
+    timeouts.add_argument("--timeout-cap", type=int, default=3600, help="Longest adaptive timeout in seconds.")
+    residency = parser.add_argument_group("model residency")
+    residency.add_argument(
+        "--skip-warmup",
+        action="store_true",
+        help="Do not load the model before the first file (its load time then lands in that file's metrics).",
+    )
+    residency.add_argument(
+        "--load-timeout",
+        type=int,
+        default=DEFAULT_LOAD_TIMEOUT,
+        help="Timeout in seconds for loading the model.",
+    )
+    residency.add_argument(
+        "--residency-check-seconds",
+        type=int,
+        default=300,
+        help="Seconds between /api/ps checks that the model is still loaded (0 to disable).",
+    )
+    residency.add_argument(
+        "--unload",
+        action="store_true",
+        help="Unload the model when the run finishes instead of keeping it for --keep-alive.",
+    )
     args = parser.parse_args()
 
     validate_args(parser, args)
-    input_dir, output_dir = resolve_paths(args)
-    input_paths = list(iter_input_files(input_dir, args.ext))
+    input_dir, input_paths = resolve_inputs(parser, args, args.ext)
+    output_dir = resolve_output_dir(args)
+    # Files already cleaned are skipped up front, so context ordering and the
+    # warm-up only see files that will actually reach the model.
+    done = {}
+    if not args.overwrite:
+        for input_path in input_paths:
+            output_path = build_output_path(input_path, input_dir, output_dir, args.ext)
+            if os.path.exists(output_path):
+                done[input_path] = output_path
+    pending = [input_path for input_path in input_paths if input_path not in done]
+    contexts = {}
+    if args.dynamic_ctx:
+        pending, contexts = order_by_context(pending, args)
     totals = init_totals()
     had_error = False
+    duplicates = find_near_duplicates(input_paths, input_dir, output_dir, args)
     total_start = time.perf_counter()
-
-    for input_path in input_paths:
-        result = process_file(input_path, input_dir, output_dir, args)
-        had_error = handle_result(result, input_path, args, totals) or had_error
+    warm = {"num_ctx": None, "checked": total_start}
+    first = next((input_path for input_path in pending if input_path not in duplicates), None)
+    if first and not args.skip_warmup:
+        warm["num_ctx"] = contexts.get(first)
+        if not warm_up(args, totals, warm["num_ctx"]):
+            sys.exit(1)
+
+    for input_path, output_path in done.items():
+        handle_result(("skip", output_path, None, 0, 0, 0, 0.0, None), input_path, args, totals)
+    try:
+        for input_path in pending:
+            if input_path in duplicates:
+                print(f"skip (near-duplicate of {duplicates[input_path]}): {input_path}", file=sys.stderr)
+                continue
+            if not args.skip_warmup:
+                keep_warm(args, totals, warm, contexts.get(input_path))
+            result = process_file(input_path, input_dir, output_dir, args)
+            had_error = handle_result(result, input_path, args, totals) or had_error
+    finally:
+        if args.unload:
+            try:
+                unload_model(args.host, args.model, args.timeout)
+                print(f"unload: {args.model}", file=sys.stderr)
+            except (urllib.error.URLError, TimeoutError, ValueError) as exc:
+                print(f"error: unload: {exc}", file=sys.stderr)
 
     finalize_run(input_paths, args, totals, total_start, had_error)
 
 
+def find_near_duplicates(input_paths, input_dir, output_dir, args):
+    """Map each redundant transcript to its cluster's representative, and write
+    the clusters so merging can reuse the representative's cleaned output."""
+    if args.near_dup_threshold is None:
+        return {}
+    start = time.perf_counter()
+    clusters = near_duplicates.cluster_files(input_paths, args.near_dup_threshold)
+    clusters_file = args.clusters_file or os.path.join(output_dir, CLUSTERS_NAME)
+    near_duplicates.write_clusters(clusters_file, clusters, args.near_dup_threshold, input_dir)
+    duplicates = near_duplicates.duplicate_map(clusters)
+    print(
+        f"near-duplicates: {len(clusters)} cluster(s), {len(duplicates)} file(s) skipped, "
+        f"time={time.perf_counter() - start:.2f}s, clusters={clusters_file}",
+        file=sys.stderr,
+    )
+    return duplicates
+
+
 def call_with_heartbeat(func, interval_seconds, label):
     if interval_seconds == 0:
         return func()
@@ -201,6 +524,12 @@ def format_metrics(stats, input_char_count, unwrapped_char_count, output_char_co
         total_duration = stats.get("total_duration")
         if total_duration:
             parts.append(f"ollama_time={total_duration / 1e9:.2f}s")
+        load_duration = stats.get("load_duration")
+        if load_duration and load_duration >= 1e9:
+            # The model was (re)loaded inside this request.
+            parts.append(f"load_s={load_duration / 1e9:.2f}")
+        if stats.get("num_ctx"):
+            parts.append(f"num_ctx={stats['num_ctx']}")
     return ", ".join(parts)
 
 
@@ -245,13 +574,39 @@ def validate_args(parser, args):
         parser.error("--retries must be >= 0")
     if args.heartbeat_seconds < 0:
         parser.error("--heartbeat-seconds must be >= 0")
-
-
-def resolve_paths(args):
-    input_dir = os.path.abspath(args.input_dir)
+    if args.load_timeout <= 0:
+        parser.error("--load-timeout must be > 0")
+    if args.residency_check_seconds < 0:
+        parser.error("--residency-check-seconds must be >= 0")
+    if args.near_dup_threshold is not None and not 0 < args.near_dup_threshold <= 1:
+        parser.error("--near-dup-threshold must be in (0, 1]")
+    try:
+        args.ctx_sizes = tuple(sorted(int(size) for size in args.ctx_sizes.split(",") if size.strip()))
+    except ValueError:
+        parser.error("--ctx-sizes must be comma-separated integers")
+    if args.dynamic_ctx and not args.ctx_sizes:
+        parser.error("--ctx-sizes must list at least one size")
+    if args.timeout_safety < 1:
+        parser.error("--timeout-safety must be >= 1")
+    if not 0 < args.timeout_floor <= args.timeout_cap:
+        parser.error("--timeout-floor must be > 0 and <= --timeout-cap")
+    # Files are sorted by context size up front, so sizes only ever grow anyway.
+    args.sticky_ctx = None
+    args.token_counter = None
+    if args.dynamic_ctx or args.adaptive_timeout:
+        try:
+            args.token_counter = TokenCounter(args.tokenizer)
+        except (OSError, RuntimeError) as exc:
+            parser.error(f"--tokenizer: {exc}")
+    args.throughput = None
+    if args.adaptive_timeout:
+        args.throughput = ThroughputModel(args.timeout, args.timeout_safety, args.timeout_floor, args.timeout_cap)
+
+
+def resolve_output_dir(args):
     output_dir = os.path.abspath(args.output_dir)
     os.makedirs(output_dir, exist_ok=True)
-    return input_dir, output_dir
+    return output_dir
 
 
 def init_totals():
@@ -263,6 +618,8 @@ def init_totals():
         "prompt_eval_duration": 0.0,
         "eval_count": 0,
         "eval_duration": 0.0,
+        "load_seconds": 0.0,
+        "loads": 0,
     }
 
 
@@ -284,17 +641,35 @@ def process_file(input_path, input_dir, output_dir, args):
         stats = None
         print(f"note: empty input, skipping ollama: {input_path}", file=sys.stderr)
     else:
+        tokens = args.token_counter.count_text(text)[1] if args.token_counter else None
+        num_ctx = None
+        if args.dynamic_ctx:
+            num_ctx, needed = context_for(tokens, args)
+            if num_ctx is None:
+                # Ollama would silently drop the start of the transcript.
+                elapsed = time.perf_counter() - start
+                err = ValueError(
+                    f"needs ~{needed} tokens of context, largest --ctx-sizes is {args.ctx_sizes[-1]}"
+                )
+                return ("error", output_path, None, raw_char_count, unwrapped_char_count, 0, elapsed, err)
         attempts = 0
         while True:
             try:
                 attempts += 1
+                timeout = args.timeout
+                if args.throughput:
+                    timeout = args.throughput.timeout(
+                        tokens + args.prompt_overhead, tokens * args.output_ratio, attempts
+                    )
                 print(
-                    f"ollama: {input_path} attempt {attempts}/{args.retries + 1}",
+                    f"ollama: {input_path} attempt {attempts}/{args.retries + 1}"
+                    + (f" num_ctx={num_ctx}" if num_ctx else "")
+                    + (f" timeout={timeout:.0f}s" if args.throughput else ""),
                     file=sys.stderr,
                 )
                 cleaned, stats = call_with_heartbeat(
                     lambda: call_ollama(
-                        args.host, args.model, text, args.timeout, args.keep_alive
+                        args.host, args.model, text, timeout, args.keep_alive, num_ctx
                     ),
                     args.heartbeat_seconds,
                     input_path,
@@ -317,6 +692,10 @@ def process_file(input_path, input_dir, output_dir, args):
                     f"retry: {input_path} attempt {attempts + 1}/{args.retries + 1} after error: {exc}",
                     file=sys.stderr,
                 )
+        if args.throughput:
+            args.throughput.observe(stats)
+        if num_ctx and (stats.get("prompt_eval_count") or 0) + (stats.get("eval_count") or 0) >= num_ctx:
+            print(f"note: output reached num_ctx={num_ctx}, may be truncated: {input_path}", file=sys.stderr)
 
     with open(output_path, "w", encoding="utf-8") as f:
         f.write(cleaned)
@@ -376,7 +755,8 @@ def finalize_run(input_paths, args, totals, total_start, had_error):
     if total == 0:
         print("no matching files found", file=sys.stderr)
     if args.metrics and total > 0:
-        total_elapsed = time.perf_counter() - total_start
+        # Model loads are reported on their own line, not as cleanup time.
+        total_elapsed = time.perf_counter() - total_start - totals.get("load_seconds", 0.0)
         metric = format_totals(
             total_elapsed,
             totals["input_chars"],
@@ -388,6 +768,17 @@ def finalize_run(input_paths, args, totals, total_start, had_error):
             totals["eval_duration"],
         )
         print(f"metrics: total: {metric}", file=sys.stderr)
+        if args.throughput and args.throughput.samples:
+            print(
+                f"metrics: learned: prefill_tok/sec={args.throughput.prefill_tps:.2f}, "
+                f"gen_tok/sec={args.throughput.gen_tps:.2f}",
+                file=sys.stderr,
+            )
+        if totals.get("loads"):
+            print(
+                f"metrics: model load: loads={totals['loads']}, load_s={totals['load_seconds']:.2f} (excluded from total)",
+                file=sys.stderr,
+            )
     if had_error:
         sys.exit(1)
 
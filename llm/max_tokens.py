@@ -1,92 +1,291 @@
 #!/usr/bin/env python3
 import argparse
+import math
+import multiprocessing
 import os
-import re
 import sys
-import statistics
 
+from token_counter import (
+    CONTEXT_SIZES,
+    OUTPUT_RATIO,
+    PROMPT_OVERHEAD,
+    TokenCounter,
+    add_counter_arguments,
+    add_manifest_arguments,
+    context_needed,
+    counter_from_args,
+    fit_context,
+    resolve_inputs,
+)
 
-WORD_RE = re.compile(r"\S+")
+CHUNK_FILES = 64
+QUANTILES = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 0.99)
+# (layers, kv heads, head dim) for the Llama 3.1 sizes we run.
+MODELS = {
+    "8b": (32, 8, 128),
+    "70b": (80, 8, 128),
+}
+# Bytes per cached K/V element for Ollama's OLLAMA_KV_CACHE_TYPE values.
+KV_CACHE_TYPES = {
+    "f16": 2.0,
+    "q8_0": 34 / 32,
+    "q4_0": 18 / 32,
+}
+# Rough GH200 throughput; pass measured prompt_tok/sec and gen_tok/sec from
+# batch_cleanup metrics for real numbers.
+DEFAULT_RATES = {
+    "8b": (4000.0, 150.0),
+    "70b": (800.0, 37.0),
+}
 
 
-def count_words(text):
-    return len(WORD_RE.findall(text))
+class QuantileSketch:
+    """Log-bucketed histogram with ~`accuracy` relative error on quantiles.
 
+    Buckets only need adding to merge, so each worker keeps its own sketch and
+    the totals never hold one entry per file.
+    """
 
-def approx_tokens_from_words(words):
-    # 0.75 words/token => tokens ~= words / 0.75 = words * 4/3
-    return int(round(words * 4 / 3))
+    def __init__(self, accuracy=0.01):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zeros = 0
+        self.count = 0
+        self.max = 0
 
+    def add(self, value):
+        self.count += 1
+        self.max = max(self.max, value)
+        if value <= 0:
+            self.zeros += 1
+            return
+        index = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
 
-def iter_files(input_dir, ext):
-    for root, _, files in os.walk(input_dir):
-        for name in sorted(files):
-            if ext and not name.endswith(ext):
-                continue
-            yield os.path.join(root, name)
+    def merge(self, other):
+        self.count += other.count
+        self.zeros += other.zeros
+        self.max = max(self.max, other.max)
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def quantile(self, q):
+        return self.value_at_rank(q * (self.count - 1))
+
+    def value_at_rank(self, rank):
+        """Approximate value of the `rank`-th smallest item (0-based)."""
+        if self.count == 0:
+            return 0
+        seen = self.zeros
+        if rank < seen:
+            return 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                break
+        return min(self.max, int(round(2 * self.gamma ** index / (self.gamma + 1))))
+
+
+class ScanStats:
+    """Per-worker totals, merged in the parent."""
+
+    def __init__(self, sizes, output_ratio, overhead):
+        self.sizes = sizes
+        self.output_ratio = output_ratio
+        self.overhead = overhead
+        self.files = 0
+        self.total_words = 0
+        self.total_tokens = 0
+        self.max_tokens = -1
+        self.max_words = 0
+        self.max_path = None
+        self.sketch = QuantileSketch()
+        # num_ctx (None: fits no size) -> [files, input tokens]
+        self.buckets = {}
+        # Newly counted (sha256, words, tokens), for the parent's cache file.
+        self.counts = []
+
+    def add(self, path, words, tokens):
+        self.files += 1
+        self.total_words += words
+        self.total_tokens += tokens
+        if tokens > self.max_tokens:
+            self.max_tokens, self.max_words, self.max_path = tokens, words, path
+        self.sketch.add(tokens)
+        size = fit_context(context_needed(tokens, self.output_ratio, self.overhead), self.sizes)
+        bucket = self.buckets.setdefault(size, [0, 0])
+        bucket[0] += 1
+        bucket[1] += tokens
+
+    def merge(self, other):
+        self.files += other.files
+        self.total_words += other.total_words
+        self.total_tokens += other.total_tokens
+        if other.max_tokens > self.max_tokens:
+            self.max_tokens, self.max_words, self.max_path = other.max_tokens, other.max_words, other.max_path
+        self.sketch.merge(other.sketch)
+        for size, (files, tokens) in other.buckets.items():
+            bucket = self.buckets.setdefault(size, [0, 0])
+            bucket[0] += files
+            bucket[1] += tokens
+
+
+_worker = {}
+
+
+def _init_worker(tokenizer_path, counts, sizes, output_ratio, overhead):
+    # Each process encodes on one thread; the pool provides the parallelism.
+    _worker["counter"] = TokenCounter(tokenizer_path, threads=1, counts=counts)
+    _worker["config"] = (sizes, output_ratio, overhead)
+
+
+def _scan_chunk(paths):
+    counter = _worker["counter"]
+    stats = ScanStats(*_worker["config"])
+    for path, words, tokens in counter.count_files(paths):
+        stats.add(path, words, tokens)
+    stats.counts, counter.added = counter.added, []
+    return stats
+
+
+def scan(paths, counter, tokenizer_path, workers, sizes, output_ratio, overhead):
+    """Count every file on `workers` processes; returns merged ScanStats and
+    records newly counted files in `counter`'s cache."""
+    chunks = [paths[i:i + CHUNK_FILES] for i in range(0, len(paths), CHUNK_FILES)]
+    initargs = (tokenizer_path, counter.cached(), sizes, output_ratio, overhead)
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=initargs)
+        results = pool.imap_unordered(_scan_chunk, chunks)
+    else:
+        _init_worker(*initargs)
+        results = map(_scan_chunk, chunks)
+    total = ScanStats(sizes, output_ratio, overhead)
+    try:
+        for stats in results:
+            counter.record(stats.counts)
+            total.merge(stats)
+    finally:
+        if pool:
+            pool.terminate()
+    return total
+
+
+def kv_cache_bytes(num_ctx, model, kv_type):
+    layers, kv_heads, head_dim = MODELS[model]
+    # K and V, per layer, per KV head, per position.
+    return 2 * layers * kv_heads * head_dim * num_ctx * KV_CACHE_TYPES[kv_type]
+
+
+def format_hours(seconds):
+    return f"{seconds / 3600:.1f}h"
 
 
 def main():
     parser = argparse.ArgumentParser(
-        description="Find max words/tokens across text files in a directory."
+        description="Token-count distribution of a directory of text files, with the KV "
+                    "cache and Ollama time each num_ctx bucket implies."
     )
-    parser.add_argument("--input-dir", required=True, help="Directory to scan.")
+    parser.add_argument("--input-dir", default=None, help="Directory to scan.")
+    add_manifest_arguments(parser)
     parser.add_argument("--ext", default=".txt", help="File extension to include.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processes reading and tokenizing files (default: all cores).",
+    )
+    add_counter_arguments(parser)
+    sizing = parser.add_argument_group("context sizing")
+    sizing.add_argument(
+        "--ctx-sizes",
+        default=",".join(str(size) for size in CONTEXT_SIZES),
+        help="Comma-separated num_ctx buckets.",
+    )
+    sizing.add_argument(
+        "--output-ratio",
+        type=float,
+        default=OUTPUT_RATIO,
+        help="Expected output tokens per input token.",
+    )
+    sizing.add_argument(
+        "--overhead",
+        type=int,
+        default=PROMPT_OVERHEAD,
+        help="Tokens of system prompt and template per request.",
+    )
+    sizing.add_argument("--model-size", choices=sorted(MODELS), default="70b")
+    sizing.add_argument(
+        "--kv-cache-type",
+        choices=sorted(KV_CACHE_TYPES),
+        default="f16",
+        help="Ollama KV cache type (OLLAMA_KV_CACHE_TYPE).",
+    )
+    sizing.add_argument("--prefill-tps", type=float, default=None, help="Prompt tokens/sec (default: per model size).")
+    sizing.add_argument("--gen-tps", type=float, default=None, help="Generated tokens/sec (default: per model size).")
     args = parser.parse_args()
 
-    input_dir = os.path.abspath(args.input_dir)
+    input_dir, paths = resolve_inputs(parser, args, args.ext)
     if not os.path.isdir(input_dir):
         print(f"not a directory: {input_dir}", file=sys.stderr)
         sys.exit(1)
+    if args.workers < 1:
+        parser.error("--workers must be >= 1")
+    try:
+        sizes = tuple(sorted(int(size) for size in args.ctx_sizes.split(",") if size.strip()))
+    except ValueError:
+        parser.error("--ctx-sizes must be comma-separated integers")
+    default_prefill, default_gen = DEFAULT_RATES[args.model_size]
+    prefill_tps = args.prefill_tps or default_prefill
+    gen_tps = args.gen_tps or default_gen
 
-    max_path = None
-    max_words = -1
-    max_tokens = -1
-    token_counts = []
-
-    seen = 0
-    for path in iter_files(input_dir, args.ext):
-        seen += 1
-        with open(path, "r", encoding="utf-8", errors="replace") as f:
-            text = f.read()
-        words = count_words(text)
-        tokens = approx_tokens_from_words(words)
-        token_counts.append(tokens)
-        if words > max_words:
-            max_words = words
-            max_tokens = tokens
-            max_path = path
-
-    if seen == 0:
+    counter = counter_from_args(args, input_dir)
+    if not paths:
         print("no matching files found", file=sys.stderr)
         sys.exit(1)
+    stats = scan(paths, counter, args.tokenizer, args.workers, sizes, args.output_ratio, args.overhead)
+    sketch = stats.sketch
 
-    total_tokens = sum(token_counts)
-    avg_tokens = statistics.mean(token_counts)
-
-    token_counts.sort()
-    median_tokens = int(round(statistics.median(token_counts)))
-
-    deciles = []
-    n = len(token_counts)
+    print(f"files: {stats.files}")
+    print(f"max_file: {stats.max_path}")
+    print(f"max_words: {stats.max_words}")
+    print(f"{'tokens' if counter.exact else 'approx_tokens'}: {stats.max_tokens}")
+    print(f"total_tokens: {stats.total_tokens}")
+    print(f"avg_tokens: {stats.total_tokens / stats.files:.2f}")
+    print(f"median_tokens: {sketch.quantile(0.5)}")
+    n = stats.files
     for i in range(10):
         start = (i * n) // 10
         end = ((i + 1) * n) // 10
         if end == 0:
             q_min = q_max = 0
         else:
-            q_min = token_counts[start]
-            q_max = token_counts[end - 1]
-        deciles.append((q_min, q_max, end - start))
-
-    print(f"max_file: {max_path}")
-    print(f"max_words: {max_words}")
-    print(f"approx_tokens: {max_tokens}")
-    print(f"total_tokens: {total_tokens}")
-    print(f"avg_tokens: {avg_tokens:.2f}")
-    print(f"median_tokens: {median_tokens}")
-    for idx, (q_min, q_max, count) in enumerate(deciles, start=1):
-        print(f"decile_{idx}: {q_min}-{q_max} (count: {count})")
+            q_min = sketch.value_at_rank(start)
+            q_max = sketch.value_at_rank(end - 1)
+        print(f"decile_{i + 1}: {q_min}-{q_max} (count: {end - start})")
+    for q in QUANTILES:
+        print(f"p{round(q * 100)}: {sketch.quantile(q)}")
+
+    print()
+    print(
+        f"num_ctx buckets ({args.model_size}, kv={args.kv_cache_type}, output x{args.output_ratio:g}, "
+        f"+{args.overhead} prompt; prefill {prefill_tps:g} tok/s, gen {gen_tps:g} tok/s):"
+    )
+    print(f"{'num_ctx':>8} {'files':>7} {'share':>6} {'in_tokens':>11} {'kv_cache':>9} {'prefill':>8} {'generate':>9}")
+    for size in sorted(stats.buckets, key=lambda size: (size is None, size)):
+        files, tokens = stats.buckets[size]
+        label = str(size) if size else "too_big"
+        kv = f"{kv_cache_bytes(size, args.model_size, args.kv_cache_type) / 1024 ** 3:.1f}GiB" if size else "-"
+        print(
+            f"{label:>8} {files:>7} {files / stats.files:>6.1%} {tokens:>11} {kv:>9} "
+            f"{format_hours(tokens / prefill_tps):>8} {format_hours(tokens * args.output_ratio / gen_tps):>9}"
+        )
+    print(
+        f"{'total':>8} {stats.files:>7} {1:>6.1%} {stats.total_tokens:>11} {'':>9} "
+        f"{format_hours(stats.total_tokens / prefill_tps):>8} "
+        f"{format_hours(stats.total_tokens * args.output_ratio / gen_tps):>9}"
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""Cluster near-identical transcripts with MinHash + LSH.
+
+Different recordings of the same talk (or rebroadcasts) produce raw transcripts
+that differ only in a few words. Cleaning each with the 70B model is wasted GPU
+time, so batch_cleanup.py can send one representative per cluster instead.
+
+Signatures use one-permutation MinHash (a single hash per shingle, split into
+`num_perm` bins, with empty bins filled from their neighbours), so building
+them is linear in the transcript length with no third-party dependencies.
+LSH banding then only compares transcripts that share a band, which keeps the
+whole archive far from quadratic.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+
+from token_counter import add_manifest_arguments, resolve_inputs
+
+WORD_RE = re.compile(r"[a-z0-9']+")
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+DEFAULT_THRESHOLD = 0.8
+MAX_HASH = (1 << 64) - 1
+# Added per bin of distance when borrowing a neighbour's value for an empty bin.
+DENSIFY_OFFSET = 0x9E3779B97F4A7C15
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """64-bit hashes of every run of `size` normalized words (the whole text
+    if it is shorter than that)."""
+    words = WORD_RE.findall(text.lower())
+    runs = (words[i:i + size] for i in range(max(1, len(words) - size + 1))) if words else ()
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(run).encode("utf-8"), digest_size=8).digest(), "little")
+        for run in runs
+    }
+
+
+def signature(hashes, num_perm=NUM_PERM):
+    bins = [None] * num_perm
+    for value in hashes:
+        slot = value % num_perm
+        rank = value // num_perm
+        if bins[slot] is None or rank < bins[slot]:
+            bins[slot] = rank
+    if all(rank is None for rank in bins):
+        return tuple([MAX_HASH] * num_perm)
+    signature = []
+    for slot in range(num_perm):
+        distance = 0
+        while bins[(slot + distance) % num_perm] is None:
+            distance += 1
+        signature.append((bins[(slot + distance) % num_perm] + distance * DENSIFY_OFFSET) & MAX_HASH)
+    return tuple(signature)
+
+
+def estimated_jaccard(a, b):
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def lsh_params(threshold, num_perm=NUM_PERM):
+    """(bands, rows) with the S-curve midpoint (1/bands)^(1/rows) closest to,
+    but not above, `threshold`. Candidates are verified afterwards, so a
+    low midpoint only costs a few extra comparisons while one above the
+    threshold would silently miss real duplicates."""
+    options = [(bands, num_perm // bands) for bands in range(1, num_perm + 1) if num_perm % bands == 0]
+    below = [option for option in options if (1 / option[0]) ** (1 / option[1]) <= threshold] or options[-1:]
+    return max(below, key=lambda option: (1 / option[0]) ** (1 / option[1]))
+
+
+class UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def cluster_signatures(signatures, threshold=DEFAULT_THRESHOLD):
+    """Group indexes whose estimated Jaccard similarity is >= threshold.
+
+    Only pairs that agree on every row of at least one LSH band are compared,
+    and matches are merged transitively. Returns a list of index lists with
+    singletons omitted.
+    """
+    num_perm = len(signatures[0]) if signatures else NUM_PERM
+    bands, rows = lsh_params(threshold, num_perm)
+    buckets = {}
+    for index, sig in enumerate(signatures):
+        if sig[0] == MAX_HASH:
+            # Empty transcript; nothing meaningful to compare.
+            continue
+        for band in range(bands):
+            buckets.setdefault((band, sig[band * rows:(band + 1) * rows]), []).append(index)
+
+    union = UnionFind(len(signatures))
+    checked = set()
+    for members in buckets.values():
+        for position, i in enumerate(members):
+            for j in members[position + 1:]:
+                if (i, j) in checked:
+                    continue
+                checked.add((i, j))
+                if estimated_jaccard(signatures[i], signatures[j]) >= threshold:
+                    union.union(i, j)
+
+    groups = {}
+    for index in range(len(signatures)):
+        groups.setdefault(union.find(index), []).append(index)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+def cluster_files(paths, threshold=DEFAULT_THRESHOLD):
+    """Cluster files by content. Each cluster's representative is its longest
+    transcript (ties: first path); returns a list of
+    {"representative": path, "members": [{"path", "similarity"}]}."""
+    lengths = []
+    signatures = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        lengths.append(len(text))
+        signatures.append(signature(shingles(text)))
+    result = []
+    for members in cluster_signatures(signatures, threshold):
+        representative = max(members, key=lambda i: (lengths[i], -i))
+        result.append({
+            "representative": paths[representative],
+            "members": [
+                {
+                    "path": paths[i],
+                    "similarity": round(estimated_jaccard(signatures[i], signatures[representative]), 4),
+                }
+                for i in members
+                if i != representative
+            ],
+        })
+    result.sort(key=lambda cluster: cluster["representative"])
+    return result
+
+
+def write_clusters(path, clusters, threshold, base_dir=None):
+    def rel(p):
+        return os.path.relpath(p, base_dir) if base_dir else p
+
+    data = {
+        "threshold": threshold,
+        "shingle_size": SHINGLE_SIZE,
+        "num_perm": NUM_PERM,
+        "clusters": [
+            {
+                "representative": rel(cluster["representative"]),
+                "members": [dict(member, path=rel(member["path"])) for member in cluster["members"]],
+            }
+            for cluster in clusters
+        ],
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+
+
+def duplicate_map(clusters):
+    """{member path: representative path} for every non-representative."""
+    return {
+        member["path"]: cluster["representative"]
+        for cluster in clusters
+        for member in cluster["members"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report clusters of near-duplicate transcripts.")
+    parser.add_argument("--input-dir", default=None, help="Directory with transcripts.")
+    add_manifest_arguments(parser)
+    parser.add_argument("--ext", default=".txt", help="File extension to include.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Estimated Jaccard similarity of 5-word shingles to count as a duplicate.",
+    )
+    parser.add_argument("--output", default=None, help="Write clusters as JSON here.")
+    args = parser.parse_args()
+
+    if not 0 < args.threshold <= 1:
+        parser.error("--threshold must be in (0, 1]")
+    input_dir, paths = resolve_inputs(parser, args, args.ext)
+    clusters = cluster_files(paths, args.threshold)
+    for cluster in clusters:
+        print(f"cluster: {os.path.relpath(cluster['representative'], input_dir)}")
+        for member in cluster["members"]:
+            print(f"  {os.path.relpath(member['path'], input_dir)} ({member['similarity']:.3f})")
+    duplicates = sum(len(cluster["members"]) for cluster in clusters)
+    print(f"files: {len(paths)}, clusters: {len(clusters)}, redundant: {duplicates}", file=sys.stderr)
+    if args.output:
+        write_clusters(args.output, clusters, args.threshold, input_dir)
+
+
+if __name__ == "__main__":
+    main()
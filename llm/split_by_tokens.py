@@ -1,29 +1,21 @@
 #!/usr/bin/env python3
 import argparse
+import json
 import os
-import re
 import shutil
 import sys
 
+from token_counter import (
+    MANIFEST_NAME,
+    add_counter_arguments,
+    bucket_name,
+    counter_from_args,
+    fit_context,
+    iter_files,
+    load_manifest,
+)
 
-WORD_RE = re.compile(r"\S+")
-
-
-def count_words(text):
-    return len(WORD_RE.findall(text))
-
-
-def approx_tokens_from_words(words):
-    # 0.75 words/token => tokens ~= words / 0.75 = words * 4/3
-    return int(round(words * 4 / 3))
-
-
-def iter_files(input_dir, ext):
-    for root, _, files in os.walk(input_dir):
-        for name in sorted(files):
-            if ext and not name.endswith(ext):
-                continue
-            yield os.path.join(root, name)
+LINK_MODES = ("symlink", "hardlink")
 
 
 def move_file(src, dest, overwrite):
@@ -37,9 +29,111 @@ def move_file(src, dest, overwrite):
     return True
 
 
+def build_manifest(counter, paths, input_dir, limits, materialize_dir=None):
+    """Bucket each file under the smallest limit holding its token count; files
+    over every limit go to "over"."""
+    buckets = {bucket_name(limit): {"max_tokens": limit, "files": []} for limit in limits}
+    buckets[bucket_name(None)] = {"max_tokens": None, "files": []}
+    for path, words, tokens in counter.count_files(paths):
+        bucket = bucket_name(fit_context(tokens, limits))
+        buckets[bucket]["files"].append(
+            {"path": os.path.relpath(path, input_dir), "tokens": tokens, "words": words}
+        )
+    manifest = {"input_dir": input_dir, "counter": counter.name, "buckets": buckets}
+    if materialize_dir:
+        manifest["materialize_dir"] = materialize_dir
+    return manifest
+
+
+def write_manifest(path, manifest):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def _is_link(path):
+    """True for entries materialize() may replace: symlinks, or hardlinked files."""
+    return os.path.islink(path) or (os.path.isfile(path) and os.stat(path).st_nlink > 1)
+
+
+def materialize(manifest, target_dir, mode):
+    """Mirror every bucket as <target_dir>/<bucket>/<relative path> links to
+    the source files, removing links left over from earlier bucketings.
+    Returns (made, removed)."""
+    input_dir = manifest["input_dir"]
+    wanted = {}
+    for bucket, entry in manifest["buckets"].items():
+        for file in entry["files"]:
+            wanted[os.path.join(target_dir, bucket, file["path"])] = os.path.join(input_dir, file["path"])
+
+    removed = 0
+    if os.path.isdir(target_dir):
+        for root, _, names in os.walk(target_dir, topdown=False):
+            for name in names:
+                path = os.path.join(root, name)
+                if path not in wanted and _is_link(path):
+                    os.remove(path)
+                    removed += 1
+            if root != target_dir and not os.listdir(root):
+                os.rmdir(root)
+
+    made = 0
+    for link_path, source in wanted.items():
+        if os.path.lexists(link_path):
+            same = os.path.exists(link_path) and os.path.samefile(link_path, source)
+            if same and os.path.islink(link_path) == (mode == "symlink"):
+                continue
+            os.remove(link_path)
+        os.makedirs(os.path.dirname(link_path), exist_ok=True)
+        if mode == "symlink":
+            os.symlink(source, link_path)
+        else:
+            os.link(source, link_path)
+        made += 1
+    return made, removed
+
+
+def split_manifest(args, input_dir, counter):
+    try:
+        limits = tuple(sorted({int(limit) for limit in args.buckets.split(",") if limit.strip()}))
+    except ValueError:
+        print("--buckets must be comma-separated integers", file=sys.stderr)
+        sys.exit(1)
+    manifest_path = os.path.abspath(args.manifest or os.path.join(input_dir, MANIFEST_NAME))
+    materialize_dir = os.path.abspath(args.materialize) if args.materialize else None
+    # Links from an earlier --materialize stay on disk after a run without it;
+    # the manifest remembers where, so they are never counted as inputs.
+    try:
+        previous_dir = load_manifest(manifest_path).get("materialize_dir")
+    except (OSError, ValueError):
+        previous_dir = None
+    excluded = [directory for directory in (materialize_dir, previous_dir) if directory]
+    paths = [
+        path
+        for path in iter_files(input_dir, args.ext)
+        if not os.path.islink(path)
+        and all(os.path.commonpath([path, directory]) != directory for directory in excluded)
+    ]
+    manifest = build_manifest(counter, paths, input_dir, limits, materialize_dir or previous_dir)
+    for bucket, entry in manifest["buckets"].items():
+        tokens = sum(file["tokens"] for file in entry["files"])
+        print(f"{bucket}: {len(entry['files'])} files, {tokens} tokens")
+    if args.dry_run:
+        return
+    write_manifest(manifest_path, manifest)
+    print(f"manifest: {manifest_path}")
+    if materialize_dir:
+        made, removed = materialize(manifest, materialize_dir, args.link)
+        print(f"linked: {made}")
+        print(f"unlinked: {removed}")
+
+
 def main():
     parser = argparse.ArgumentParser(
-        description="Split files into small/large directories based on token count."
+        description="Split files into small/large directories based on token count, "
+                    "or (with --buckets) write a manifest of N token-size buckets without moving anything."
     )
     parser.add_argument("--input-dir", required=True, help="Directory to scan.")
     parser.add_argument("--ext", default=".txt", help="File extension to include.")
@@ -69,6 +163,25 @@ def main():
         action="store_true",
         help="Print actions without moving files.",
     )
+    buckets = parser.add_argument_group("manifest mode")
+    buckets.add_argument(
+        "--buckets",
+        default=None,
+        help="Comma-separated token limits, e.g. 4096,8192,16384,32768,65536. Files stay "
+             "where they are; the bucket of each file is written to the manifest.",
+    )
+    buckets.add_argument(
+        "--manifest",
+        default=None,
+        help=f"Manifest path (default: <input-dir>/{MANIFEST_NAME}).",
+    )
+    buckets.add_argument(
+        "--materialize",
+        default=None,
+        help="Also mirror each bucket as <dir>/<bucket>/... links to the original files.",
+    )
+    buckets.add_argument("--link", choices=LINK_MODES, default="symlink", help="Link type for --materialize.")
+    add_counter_arguments(parser)
     args = parser.parse_args()
 
     input_dir = os.path.abspath(args.input_dir)
@@ -76,23 +189,24 @@ def main():
         print(f"not a directory: {input_dir}", file=sys.stderr)
         sys.exit(1)
 
+    counter = counter_from_args(args, input_dir)
+    if args.buckets:
+        split_manifest(args, input_dir, counter)
+        return
+
     small_dir = os.path.abspath(args.small_dir or os.path.join(input_dir, "small"))
     large_dir = os.path.abspath(args.large_dir or os.path.join(input_dir, "large"))
 
     moved_small = 0
     moved_large = 0
 
-    for path in iter_files(input_dir, args.ext):
-        if os.path.commonpath([path, small_dir]) == small_dir:
-            continue
-        if os.path.commonpath([path, large_dir]) == large_dir:
-            continue
-
-        with open(path, "r", encoding="utf-8", errors="replace") as f:
-            text = f.read()
-        words = count_words(text)
-        tokens = approx_tokens_from_words(words)
-
+    paths = [
+        path
+        for path in iter_files(input_dir, args.ext)
+        if os.path.commonpath([path, small_dir]) != small_dir
+        and os.path.commonpath([path, large_dir]) != large_dir
+    ]
+    for path, _, tokens in counter.count_files(paths):
         rel_path = os.path.relpath(path, input_dir)
         if tokens <= args.threshold:
             dest = os.path.join(small_dir, rel_path)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""Token counts for transcripts, shared by every tool that sizes inputs.
+
+By default tokens are estimated from words (x 4/3). Given the Llama 3.1
+`tokenizer.model` from Meta's download (the tiktoken BPE file, stored
+locally so nothing is fetched at run time) and `pip install tiktoken`, counts
+are exact: files are encoded in batches on tiktoken's native threads.
+
+Counts are cached per file content (sha256) in a JSONL file under
+~/.cache/llm-speaker (one per input directory), so re-scanning an archive only
+encodes transcripts that changed and the archive itself is never written to.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+
+try:
+    import tiktoken
+    import tiktoken.load
+except ImportError:  # optional dependency
+    tiktoken = None
+
+WORD_RE = re.compile(r"\S+")
+TOKENIZER_ENV = "LLAMA_TOKENIZER"
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "llm-speaker")
+MANIFEST_NAME = "token_buckets.json"
+BATCH_SIZE = 64
+# Pre-tokenizer and special tokens from Meta's llama3 tokenizer.py.
+LLAMA3_PATTERN = (
+    r"(?i:'s|'t|'re|'ve|'m|'ll|'d)|[^\r\n\p{L}\p{N}]?\p{L}+|\p{N}{1,3}|"
+    r" ?[^\s\p{L}\p{N}]+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+"
+)
+NUM_RESERVED_SPECIAL_TOKENS = 256
+# Context sizes requests are rounded up to, so Ollama only ever sees a few.
+CONTEXT_SIZES = (2048, 4096, 8192, 16384, 32768, 65536, 131072)
+# Cleanup rewrites the transcript, so it generates about as many tokens as it reads.
+OUTPUT_RATIO = 1.0
+# Modelfile system prompt and chat template around the transcript.
+PROMPT_OVERHEAD = 512
+
+
+def count_words(text):
+    return len(WORD_RE.findall(text))
+
+
+def approx_tokens_from_words(words):
+    # 0.75 words/token => tokens ~= words / 0.75 = words * 4/3
+    return int(round(words * 4 / 3))
+
+
+def iter_files(input_dir, ext):
+    for root, _, files in os.walk(input_dir):
+        for name in sorted(files):
+            if ext and not name.endswith(ext):
+                continue
+            yield os.path.join(root, name)
+
+
+def context_needed(tokens, output_ratio=OUTPUT_RATIO, overhead=PROMPT_OVERHEAD):
+    """Tokens of context a cleanup of `tokens` input tokens occupies."""
+    return int(tokens * (1 + output_ratio)) + overhead
+
+
+def fit_context(needed, sizes=CONTEXT_SIZES):
+    """Smallest size in `sizes` holding `needed` tokens, or None if none does."""
+    for size in sorted(sizes):
+        if needed <= size:
+            return size
+    return None
+
+
+def load_llama3_encoding(tokenizer_path):
+    if tiktoken is None:
+        raise RuntimeError("exact token counts need tiktoken (pip install tiktoken)")
+    ranks = tiktoken.load.load_tiktoken_bpe(tokenizer_path)
+    names = [
+        "<|begin_of_text|>",
+        "<|end_of_text|>",
+        "<|reserved_special_token_0|>",
+        "<|reserved_special_token_1|>",
+        "<|finetune_right_pad_id|>",
+        "<|step_id|>",
+        "<|start_header_id|>",
+        "<|end_header_id|>",
+        "<|eom_id|>",
+        "<|eot_id|>",
+        "<|python_tag|>",
+    ]
+    names += [
+        f"<|reserved_special_token_{i}|>"
+        for i in range(2, NUM_RESERVED_SPECIAL_TOKENS - len(names) + 2)
+    ]
+    special = {name: len(ranks) + i for i, name in enumerate(names)}
+    return tiktoken.Encoding(
+        name=os.path.basename(tokenizer_path),
+        pat_str=LLAMA3_PATTERN,
+        mergeable_ranks=ranks,
+        special_tokens=special,
+    )
+
+
+def _file_digest(path):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class TokenCounter:
+    """Counts words and tokens for texts and files.
+
+    `name` identifies the counting method ("approx" or "llama3:<vocab hash>"),
+    so cached counts from a different tokenizer are never reused.
+    """
+
+    def __init__(self, tokenizer_path=None, cache_path=None, threads=None, counts=()):
+        self.encoding = None
+        self.name = "approx"
+        if tokenizer_path:
+            self.encoding = load_llama3_encoding(tokenizer_path)
+            self.name = f"llama3:{_file_digest(tokenizer_path)[:12]}"
+        self.threads = threads or os.cpu_count() or 1
+        self.cache_path = cache_path
+        self.added = []
+        self._cache = {}
+        self._lock = threading.Lock()
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A run killed mid-write leaves a partial last line.
+                        continue
+                    self._cache[(entry["counter"], entry["sha256"])] = (entry["words"], entry["tokens"])
+        for digest, words, tokens in counts:
+            self._cache[(self.name, digest)] = (words, tokens)
+
+    @property
+    def exact(self):
+        return self.encoding is not None
+
+    def count_texts(self, texts):
+        """[(words, tokens)] for each text, encoding them as one batch."""
+        words = [count_words(text) for text in texts]
+        if self.encoding is None:
+            return [(count, approx_tokens_from_words(count)) for count in words]
+        encoded = self.encoding.encode_ordinary_batch(texts, num_threads=self.threads)
+        return [(count, len(tokens)) for count, tokens in zip(words, encoded)]
+
+    def count_text(self, text):
+        return self.count_texts([text])[0]
+
+    def count_files(self, paths, batch_size=BATCH_SIZE):
+        """Yield (path, words, tokens) in order, reading cached counts where
+        the file's content hash has been counted before."""
+        paths = list(paths)
+        for first in range(0, len(paths), batch_size):
+            batch = paths[first:first + batch_size]
+            digests = []
+            texts = {}
+            for path in batch:
+                with open(path, "rb") as f:
+                    data = f.read()
+                digest = hashlib.sha256(data).hexdigest()
+                digests.append(digest)
+                if (self.name, digest) not in self._cache and digest not in texts:
+                    texts[digest] = data.decode("utf-8", errors="replace")
+            if texts:
+                counts = self.count_texts(list(texts.values()))
+                self.record([(digest, words, tokens) for digest, (words, tokens) in zip(texts, counts)])
+            for path, digest in zip(batch, digests):
+                words, tokens = self._cache[(self.name, digest)]
+                yield path, words, tokens
+
+    def count_file(self, path):
+        return next(self.count_files([path]))[1:]
+
+    def cached(self):
+        """[(sha256, words, tokens)] for this counter, e.g. to seed workers."""
+        return [(digest, *counts) for (name, digest), counts in self._cache.items() if name == self.name]
+
+    def record(self, entries):
+        """Add (sha256, words, tokens) counts, appending them to the cache file."""
+        with self._lock:
+            lines = []
+            for digest, words, tokens in entries:
+                self._cache[(self.name, digest)] = (words, tokens)
+                self.added.append((digest, words, tokens))
+                lines.append(json.dumps(
+                    {"counter": self.name, "sha256": digest, "words": words, "tokens": tokens}
+                ))
+            if self.cache_path and lines:
+                with open(self.cache_path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+
+
+def default_cache_path(input_dir):
+    """Cache file for `input_dir`, keyed by its absolute path."""
+    key = hashlib.sha256(os.path.abspath(input_dir).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"token_counts-{key}.jsonl")
+
+
+def add_counter_arguments(parser):
+    parser.add_argument(
+        "--tokenizer",
+        default=os.environ.get(TOKENIZER_ENV),
+        help="Llama 3.1 tokenizer.model for exact token counts "
+             f"(default: ${TOKENIZER_ENV}; without it tokens are estimated as words x 4/3).",
+    )
+    parser.add_argument(
+        "--token-cache",
+        default=None,
+        help="JSONL cache of per-file counts keyed by content hash "
+             f"(default: a file in {CACHE_DIR} keyed by the input directory's path).",
+    )
+    parser.add_argument(
+        "--no-token-cache",
+        action="store_true",
+        help="Neither read nor write the token-count cache.",
+    )
+
+
+def counter_from_args(args, input_dir):
+    """TokenCounter for a tool's --tokenizer/--token-cache flags; the cache
+    defaults to default_cache_path(input_dir) when an input dir is given."""
+    cache_path = None
+    if not args.no_token_cache:
+        cache_path = args.token_cache or (default_cache_path(input_dir) if input_dir else None)
+    try:
+        if cache_path:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        return TokenCounter(args.tokenizer, cache_path)
+    except (OSError, RuntimeError) as exc:
+        print(f"tokenizer: {exc}", file=sys.stderr)
+        sys.exit(1)
+
+
+def bucket_name(max_tokens):
+    if max_tokens is None:
+        return "over"
+    return f"{max_tokens // 1024}k" if max_tokens % 1024 == 0 else str(max_tokens)
+
+
+def load_manifest(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def manifest_bucket(path, bucket):
+    """(input_dir, [absolute paths]) for one bucket of a split_by_tokens manifest."""
+    manifest = load_manifest(path)
+    buckets = manifest["buckets"]
+    if bucket not in buckets:
+        raise ValueError(f"no bucket {bucket!r} in {path} (have: {', '.join(buckets)})")
+    input_dir = manifest["input_dir"]
+    return input_dir, [os.path.join(input_dir, entry["path"]) for entry in buckets[bucket]["files"]]
+
+
+def add_manifest_arguments(parser):
+    parser.add_argument(
+        "--manifest",
+        default=None,
+        help="Take input files from a split_by_tokens.py bucket manifest instead of scanning --input-dir.",
+    )
+    parser.add_argument("--bucket", default=None, help="Bucket of --manifest to process (e.g. 8k).")
+
+
+def resolve_inputs(parser, args, ext):
+    """(input_dir, paths) from --manifest/--bucket if given, else --input-dir."""
+    if args.manifest:
+        if not args.bucket:
+            parser.error("--manifest needs --bucket")
+        try:
+            return manifest_bucket(args.manifest, args.bucket)
+        except (OSError, ValueError, KeyError) as exc:  # KeyError: not a bucket manifest
+            parser.error(str(exc))
+    if not args.input_dir:
+        parser.error("one of --input-dir or --manifest is required")
+    input_dir = os.path.abspath(args.input_dir)
+    return input_dir, list(iter_files(input_dir, ext))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print words and tokens for each text file.")
+    parser.add_argument("paths", nargs="+", help="Files or directories.")
+    parser.add_argument("--ext", default=".txt", help="File extension to include in directories.")
+    add_counter_arguments(parser)
+    args = parser.parse_args()
+
+    files = []
+    for path in args.paths:
+        files.extend(iter_files(path, args.ext) if os.path.isdir(path) else [path])
+    counter = counter_from_args(args, None)
+    for path, words, tokens in counter.count_files(files):
+        print(f"{tokens}\t{words}\t{path}")
+    print(f"counter: {counter.name}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import argparse
+import os
+
+from content_fetcher.__main__ import read_ref_ids
+from content_fetcher.downloader import DOWNLOAD_URL, console, progress
+from content_fetcher.manifest import MANIFEST_NAME, DownloadManifest
+
+from .orchestrator import Pipeline, batch_cleanup, format_summary, token_counter
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description=(
+            "Stream talks through download -> transcribe -> cleanup. Each talk moves on as "
+            "soon as its previous stage finishes; bounded queues keep downloads from "
+            "outrunning transcription."
+        )
+    )
+    parser.add_argument("--input-file", action="append", required=True, help="File with one ref id per line. Repeatable.")
+    parser.add_argument("--audio-dir", required=True, help="Where MP3s are downloaded.")
+    parser.add_argument("--transcript-dir", default="./transcriptions", help="Whisper output directory.")
+    parser.add_argument("--cleaned-dir", default=None, help="Cleanup output directory (default: <transcript-dir>/cleaned).")
+    parser.add_argument("--url-template", default=DOWNLOAD_URL, help="Download URL with a {ref_id} placeholder.")
+    parser.add_argument("--overwrite", action="store_true", help="Redo transcripts and cleanups that already exist.")
+    parser.add_argument(
+        "--lineage",
+        default=None,
+        help="Fingerprint each download and skip recordings that duplicate an earlier talk "
+             "(see transcriber/dedupe.py); their outputs are symlinked at the end.",
+    )
+
+    stages = parser.add_argument_group("stages")
+    stages.add_argument("--download-workers", type=int, default=2, help="Parallel downloads (the server falls over above 5).")
+    stages.add_argument("--transcribe-workers", type=int, default=1, help="Parallel whisper runs (one per GPU).")
+    stages.add_argument("--cleanup-workers", type=int, default=1, help="Parallel Ollama requests.")
+    stages.add_argument(
+        "--transcribe-queue",
+        type=int,
+        default=2,
+        help="Downloaded talks allowed to wait for transcription before downloads pause.",
+    )
+    stages.add_argument(
+        "--cleanup-queue",
+        type=int,
+        default=8,
+        help="Transcripts allowed to wait for cleanup before transcription pauses.",
+    )
+
+    whisper = parser.add_argument_group("transcription")
+    whisper.add_argument("--whisper-model", default="turbo")
+    whisper.add_argument("--output-format", default="all")
+    whisper.add_argument("--language", default="en")
+
+    cleanup = parser.add_argument_group("cleanup")
+    cleanup.add_argument("--model", default=None, help="Ollama model; without it the pipeline stops after transcription.")
+    cleanup.add_argument("--host", default="http://localhost:11434", help="Ollama server host.")
+    cleanup.add_argument("--timeout", type=int, default=batch_cleanup.DEFAULT_TIMEOUT, help="Per-request timeout in seconds.")
+    cleanup.add_argument("--keep-alive", default="24h", help="Keep model loaded for this duration (e.g., 24h).")
+    cleanup.add_argument("--retries", type=int, default=0, help="Retries per file on request failure.")
+    cleanup.add_argument(
+        "--dynamic-ctx",
+        action="store_true",
+        help="Size options.num_ctx to each transcript (see llm/batch_cleanup.py --dynamic-ctx). Talks arrive "
+             "unsorted, so num_ctx only grows: each request gets the largest size needed so far.",
+    )
+    cleanup.add_argument(
+        "--adaptive-timeout",
+        action="store_true",
+        help="Size each request's timeout from its input and observed tok/s (see llm/batch_cleanup.py).",
+    )
+    token_counter.add_counter_arguments(cleanup)
+
+    args = parser.parse_args()
+    for name in ("download_workers", "transcribe_workers", "cleanup_workers", "transcribe_queue", "cleanup_queue"):
+        if getattr(args, name) < 1:
+            parser.error(f"--{name.replace('_', '-')} must be >= 1")
+    if args.retries < 0:
+        parser.error("--retries must be >= 0")
+    return args
+
+
+def main():
+    args = parse_args()
+    args.audio_dir = os.path.abspath(args.audio_dir)
+    args.transcript_dir = os.path.abspath(args.transcript_dir)
+    args.cleaned_dir = os.path.abspath(args.cleaned_dir or os.path.join(args.transcript_dir, "cleaned"))
+    os.makedirs(args.audio_dir, exist_ok=True)
+    args.manifest = DownloadManifest(os.path.join(args.audio_dir, MANIFEST_NAME))
+    args.cleanup_args = None
+    if args.model:
+        counter = None
+        if args.dynamic_ctx or args.adaptive_timeout:
+            counter = token_counter.counter_from_args(args, args.transcript_dir)
+        args.cleanup_args = argparse.Namespace(
+            host=args.host,
+            model=args.model,
+            ext=".txt",
+            timeout=args.timeout,
+            keep_alive=args.keep_alive,
+            overwrite=args.overwrite,
+            metrics=True,
+            retries=args.retries,
+            heartbeat_seconds=30,
+            dynamic_ctx=args.dynamic_ctx,
+            ctx_sizes=batch_cleanup.CONTEXT_SIZES,
+            output_ratio=batch_cleanup.OUTPUT_RATIO,
+            prompt_overhead=batch_cleanup.PROMPT_OVERHEAD,
+            sticky_ctx=batch_cleanup.StickyContext() if args.dynamic_ctx else None,
+            token_counter=counter,
+            throughput=batch_cleanup.ThroughputModel(args.timeout, 2.0, 60, 3600) if args.adaptive_timeout else None,
+        )
+    else:
+        args.cleaned_dir = None
+
+    ref_ids, duplicates = read_ref_ids(args.input_file)
+    console.print(f"{len(ref_ids)} talk(s) from {len(args.input_file)} list(s)" + (
+        f", {duplicates} duplicate(s) skipped" if duplicates else ""
+    ))
+
+    pipeline = Pipeline(args)
+    try:
+        with progress:
+            talks, stages, elapsed = pipeline.run(ref_ids)
+    finally:
+        args.manifest.compact()
+
+    console.print(format_summary(talks, stages, elapsed))
+    if pipeline.cleanup_totals["output_chars"]:
+        console.print("cleanup: " + batch_cleanup.format_totals(
+            elapsed,
+            *(pipeline.cleanup_totals[key] for key in (
+                "input_chars", "unwrapped_chars", "output_chars", "prompt_eval_count",
+                "prompt_eval_duration", "eval_count", "eval_duration",
+            )),
+        ))
+    failed = [talk for talk in talks if talk.failed_stage]
+    for talk in failed:
+        console.print(f"[bold red]failed[/bold red] {talk.ref_id} at {talk.failed_stage}: {talk.error}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
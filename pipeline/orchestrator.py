@@ -0,0 +1,242 @@
+import os
+import queue
+import statistics
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+from content_fetcher.downloader import console, download_task, output_path
+
+# llm/ and transcriber/ are directories of scripts, not packages.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "llm"))
+sys.path.insert(0, os.path.join(REPO_ROOT, "transcriber"))
+import batch_cleanup  # noqa: E402
+import token_counter  # noqa: E402
+
+STOP = object()
+
+
+@dataclass
+class Talk:
+    ref_id: str
+    audio_path: str = None
+    transcript_path: str = None
+    cleaned_path: str = None
+    started: float = None
+    finished: float = None
+    failed_stage: str = None
+    error: str = None
+
+
+class Stage:
+    """A pool of worker threads taking talks from `inbox` and handing them to `outbox`.
+
+    Queues are bounded, so a worker that finishes a talk blocks until the next
+    stage has room: that is the backpressure that stops downloads running ahead
+    of transcription. Time spent blocked is reported as `blocked`.
+
+    Handlers return "done", "skip" (already done earlier; passed on) or "drop"
+    (nothing further to do for this talk, e.g. a duplicate recording).
+    """
+
+    def __init__(self, name, handle, workers, inbox, outbox=None):
+        self.name = name
+        self.handle = handle
+        self.workers = workers
+        self.inbox = inbox
+        self.outbox = outbox
+        self.done = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.failed = []
+        self.busy = 0.0
+        self.blocked = 0.0
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self):
+        while True:
+            talk = self.inbox.get()
+            if talk is STOP:
+                return
+            start = time.perf_counter()
+            if talk.started is None:
+                talk.started = start
+            try:
+                outcome = self.handle(talk)
+            except Exception as exc:
+                talk.error = str(exc)
+                outcome = "error"
+            with self._lock:
+                self.busy += time.perf_counter() - start
+                if outcome == "error":
+                    talk.failed_stage = self.name
+                    self.failed.append(talk)
+                elif outcome == "skip":
+                    self.skipped += 1
+                elif outcome == "drop":
+                    self.dropped += 1
+                else:
+                    self.done += 1
+            if outcome == "error":
+                console.print(f"[bold red]{self.name} failed[/bold red] {talk.ref_id}: {talk.error}")
+                continue
+            if self.outbox is None or outcome == "drop":
+                talk.finished = time.perf_counter()
+                continue
+            put_start = time.perf_counter()
+            self.outbox.put(talk)
+            with self._lock:
+                self.blocked += time.perf_counter() - put_start
+
+
+class Pipeline:
+    """download -> transcribe -> cleanup, each stage starting on a talk as soon as
+    the previous one finishes it."""
+
+    def __init__(self, config):
+        self.config = config
+        self.manifest = config.manifest
+        self.cleanup_totals = batch_cleanup.init_totals()
+        self._totals_lock = threading.Lock()
+        self._local = threading.local()
+        self.lineage = None
+        if config.lineage:
+            # Imported here, like transcribe, so the rest works without whisper installed.
+            import dedupe
+
+            self.lineage = dedupe.FingerprintIndex(config.lineage)
+        for path in (config.audio_dir, config.transcript_dir, config.cleaned_dir):
+            if path:
+                os.makedirs(path, exist_ok=True)
+
+    def download(self, talk):
+        talk.audio_path = output_path(self.config.audio_dir, talk.ref_id)
+        if self.manifest.is_complete(talk.ref_id, talk.audio_path):
+            return "skip"
+        result = download_task(
+            talk.ref_id, self.config.audio_dir, self.config.url_template, manifest=self.manifest
+        )
+        if not result.ok:
+            talk.error = result.error
+            return "error"
+        return "done"
+
+    def dedupe(self, talk):
+        """Fingerprint the new MP3; a repeat of an earlier talk goes no further."""
+        match = self.lineage.add(talk.ref_id, talk.audio_path)
+        if match is None:
+            return "done"
+        console.print(
+            f"duplicate {talk.ref_id} of {match['canonical']} ({match['match']}); "
+            "its transcript will be linked"
+        )
+        return "drop"
+
+    def transcriber(self):
+        """The calling worker's resident Whisper model, loaded on first use."""
+        if not hasattr(self._local, "transcriber"):
+            # Imported here so the download/cleanup side works without whisper installed.
+            import transcribe
+
+            self._local.transcriber = transcribe.Transcriber(
+                self.config.whisper_model,
+                self.config.transcript_dir,
+                self.config.output_format,
+                self.config.language,
+            )
+            console.print(
+                f"whisper {self.config.whisper_model} loaded in {self._local.transcriber.load_seconds:.1f}s"
+            )
+        return self._local.transcriber
+
+    def transcribe(self, talk):
+        stem = os.path.splitext(os.path.basename(talk.audio_path))[0]
+        talk.transcript_path = os.path.join(self.config.transcript_dir, f"{stem}.txt")
+        if os.path.exists(talk.transcript_path) and not self.config.overwrite:
+            return "skip"
+        result = self.transcriber().transcribe(talk.audio_path)
+        console.print(f"transcribed {talk.ref_id} (RTF {result.rtf:.3f})")
+        return "done"
+
+    def cleanup(self, talk):
+        args = self.config.cleanup_args
+        result = batch_cleanup.process_file(
+            talk.transcript_path, self.config.transcript_dir, self.config.cleaned_dir, args
+        )
+        talk.cleaned_path = result[1]
+        with self._totals_lock:
+            had_error = batch_cleanup.handle_result(result, talk.transcript_path, args, self.cleanup_totals)
+        if had_error:
+            talk.error = str(result[-1])
+            return "error"
+        return "skip" if result[0] == "skip" else "done"
+
+    def run(self, ref_ids):
+        config = self.config
+        sources = queue.Queue()
+        to_transcribe = queue.Queue(maxsize=config.transcribe_queue)
+        to_cleanup = queue.Queue(maxsize=config.cleanup_queue) if config.cleanup_args else None
+
+        if self.lineage:
+            to_dedupe = queue.Queue(maxsize=config.transcribe_queue)
+            stages = [
+                Stage("download", self.download, config.download_workers, sources, to_dedupe),
+                Stage("dedupe", self.dedupe, 1, to_dedupe, to_transcribe),
+            ]
+        else:
+            stages = [Stage("download", self.download, config.download_workers, sources, to_transcribe)]
+        stages.append(Stage("transcribe", self.transcribe, config.transcribe_workers, to_transcribe, to_cleanup))
+        if to_cleanup is not None:
+            stages.append(Stage("cleanup", self.cleanup, config.cleanup_workers, to_cleanup))
+
+        talks = [Talk(ref_id) for ref_id in ref_ids]
+        for talk in talks:
+            sources.put(talk)
+        for _ in range(stages[0].workers):
+            sources.put(STOP)
+
+        start = time.perf_counter()
+        for stage in stages:
+            stage.start()
+        # Shut down front to back: once a stage has drained, tell the next one.
+        for stage, downstream in zip(stages, stages[1:] + [None]):
+            stage.join()
+            if downstream is not None:
+                for _ in range(downstream.workers):
+                    downstream.inbox.put(STOP)
+        if self.lineage:
+            for directory in (config.transcript_dir, config.cleaned_dir):
+                if directory:
+                    self.lineage.link(directory)
+        return talks, stages, time.perf_counter() - start
+
+
+def format_summary(talks, stages, elapsed):
+    lines = [f"pipeline: {len(talks)} talk(s) in {elapsed:.1f}s"]
+    for stage in stages:
+        lines.append(
+            f"  {stage.name:<10} done={stage.done} skipped={stage.skipped} dropped={stage.dropped} "
+            f"failed={len(stage.failed)} "
+            f"busy={stage.busy:.1f}s blocked_on_next={stage.blocked:.1f}s"
+        )
+    latencies = [talk.finished - talk.started for talk in talks if talk.finished is not None]
+    if latencies:
+        lines.append(
+            f"  end-to-end per talk: median={statistics.median(latencies):.1f}s max={max(latencies):.1f}s"
+        )
+    return "\n".join(lines)
@@ -3,13 +3,17 @@
 from __future__ import annotations
 
 import csv
+import hashlib
+import importlib
 import json
 import os
 import re
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, Tuple
+from typing import Dict, Iterable, Set, Tuple
 
+# Step 01b cleans durations in place; delta merges reuse it so they don't undo that.
+normalize_duration = importlib.import_module("01b_duration_field_normalizer").normalize_duration
 
 RESOURCE_ID_FIELD = "Resource ID(s)"
 TITLE_FIELD = "Title"
@@ -21,6 +25,14 @@ ROW_LIMIT: int | None = None
 # Validation handling: "enforce" skips invalid rows,
 # "log_only" logs the issues but still writes the output.
 VALIDATION_MODE = "enforce"
+# Ingest handling: "full" rewrites every row from scratch,
+# "delta" only applies rows that were added, changed or deleted since the last run
+# and keeps fields populated by later steps (transcript, dataLineage, audioUrl, ...).
+INGEST_MODE = "full"
+# Row hashes from the last run, used as the baseline for "delta" mode.
+ROW_HASHES_PATH = OUTPUT_DIR.parent / "csv_row_hashes.json"
+# Ids touched by the last "delta" run, for re-running later steps selectively.
+DELTA_CHANGES_PATH = OUTPUT_DIR.parent / "csv_delta_changes.json"
 FIELD_MAP: Dict[str, str] = {
     "Resource ID(s)": "id",
     "Resource type": "resourceType",
@@ -140,6 +152,51 @@ def transform_row(row: Dict[str, str]) -> Dict[str, object]:
     return transformed
 
 
+def csv_fields(transformed: Dict[str, object]) -> Dict[str, object]:
+    """Return only the keys that come from the CSV export."""
+    keys = {json_key for csv_key, json_key in FIELD_MAP.items() if csv_key not in IGNORED_CSV_FIELDS}
+    return {key: value for key, value in transformed.items() if key in keys}
+
+
+def row_hash(transformed: Dict[str, object]) -> str:
+    """Hash the CSV-derived fields so ignored columns don't register as changes."""
+    payload = json.dumps(csv_fields(transformed), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_row_hashes(path: Path) -> Dict[str, str]:
+    """Read the previous run's id -> row hash map, or an empty map."""
+    if not path.exists():
+        return {}
+    with path.open(encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_json(path: Path, data: Dict[str, object]) -> None:
+    """Write a talk (or bookkeeping) JSON file."""
+    with path.open("w", encoding="utf-8") as json_file:
+        # Persist the row as pretty-printed JSON for readability, sorted alphabetically by key.
+        json.dump(data, json_file, ensure_ascii=False, indent=2, sort_keys=True)
+        json_file.write("\n")
+
+
+def merge_changed_row(output_path: Path, transformed: Dict[str, object]) -> Dict[str, object]:
+    """Overlay CSV-derived fields onto an existing talk, keeping downstream fields.
+
+    Values that later steps normalise in place get the same normalisation here,
+    so a merged talk matches what the full chain would have produced.
+    """
+    if not output_path.exists():
+        return transformed
+    with output_path.open(encoding="utf-8") as f:
+        existing = json.load(f)
+    fields = csv_fields(transformed)
+    if "duration" in fields:
+        fields["duration"], _ = normalize_duration(fields["duration"])
+    existing.update(fields)
+    return existing
+
+
 def main() -> None:
     csv_path = CSV_PATH
     output_dir: Path = OUTPUT_DIR
@@ -151,6 +208,13 @@ def main() -> None:
     # Ensure the output directory exists so files can be written.
     output_dir.mkdir(parents=True, exist_ok=True)
 
+    delta = INGEST_MODE == "delta"
+    previous_hashes = load_row_hashes(ROW_HASHES_PATH) if delta else {}
+    current_hashes: Dict[str, str] = {}
+    added: Set[str] = set()
+    changed: Set[str] = set()
+    unchanged = 0
+
     written = 0
     skipped = 0
     missing_required = 0
@@ -181,14 +245,50 @@ def main() -> None:
             output_path = output_dir / f"{safe_name}.json"
 
             transformed = transform_row(row)
-
-            with output_path.open("w", encoding="utf-8") as json_file:
-                # Persist the row as pretty-printed JSON for readability, sorted alphabetically by key.
-                json.dump(transformed, json_file, ensure_ascii=False, indent=2, sort_keys=True)
-                json_file.write("\n")
-
+            digest = row_hash(transformed)
+            current_hashes[safe_name] = digest
+
+            if delta:
+                previous = previous_hashes.get(safe_name)
+                if not output_path.exists():
+                    added.add(safe_name)
+                elif previous == digest:
+                    unchanged += 1
+                    continue
+                else:
+                    # Includes talks with no recorded hash (e.g. the first delta
+                    # run): their file may already hold enriched fields.
+                    changed.add(safe_name)
+                    transformed = merge_changed_row(output_path, transformed)
+
+            write_json(output_path, transformed)
             written += 1
 
+    deleted = []
+    if delta and ROW_LIMIT is None:
+        # Rows that disappeared (or became invalid) in the new export.
+        for safe_name in sorted(set(previous_hashes) - set(current_hashes)):
+            stale_path = output_dir / f"{safe_name}.json"
+            if stale_path.exists():
+                stale_path.unlink()
+            deleted.append(safe_name)
+
+    if ROW_LIMIT is None:
+        with ROW_HASHES_PATH.open("w", encoding="utf-8") as f:
+            json.dump(current_hashes, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    if delta:
+        write_json(
+            DELTA_CHANGES_PATH,
+            {"added": sorted(added), "changed": sorted(changed), "deleted": deleted},
+        )
+        print(
+            f"Delta: added {len(added)}, changed {len(changed)}, "
+            f"deleted {len(deleted)}, unchanged {unchanged}. "
+            f"Change list written to {DELTA_CHANGES_PATH}."
+        )
+
     print(
         "Done. Wrote {written} file(s) to {output_dir}. "
         "Skipped {skipped} row(s). "
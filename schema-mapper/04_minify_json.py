@@ -5,10 +5,20 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Tuple
 
-from utils import iter_json_files, load_json, save_json_compact
+from utils import (
+    brotli,
+    iter_json_files,
+    load_json,
+    load_publish_manifest,
+    publish_precompressed,
+    save_json_compact,
+    save_publish_manifest,
+)
 
 # Directory containing the JSON files produced by earlier steps.
 OUTPUT_DIR = Path(__file__).with_name("output") / "talks"
+# Set to True to also emit .gz/.br siblings, content-hashed copies and a manifest.
+PRECOMPRESS = False
 
 
 def process_file(path: Path) -> Tuple[bool, str]:
@@ -22,16 +32,26 @@ def main() -> None:
     if not OUTPUT_DIR.exists():
         raise FileNotFoundError(f"Output directory not found: {OUTPUT_DIR}")
 
+    if PRECOMPRESS and brotli is None:
+        print("[note] brotli not installed; writing .gz only.")
+
     updated = 0
+    compressed = 0
+    manifest = load_publish_manifest() if PRECOMPRESS else {}
 
     for json_path in iter_json_files(OUTPUT_DIR):
         ok, reason = process_file(json_path)
         if ok:
             updated += 1
+            if PRECOMPRESS and publish_precompressed(json_path, manifest):
+                compressed += 1
         else:
             print(f"[skip] {json_path.name}: {reason}")
 
     print(f"Done. Minified {updated} file(s).")
+    if PRECOMPRESS:
+        save_publish_manifest(manifest)
+        print(f"Precompressed {compressed} changed file(s); {updated - compressed} unchanged.")
 
 
 if __name__ == "__main__":
@@ -2,8 +2,10 @@
 
 from __future__ import annotations
 
+import re
+from datetime import date
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from utils import LINEAGE_STAGES, iter_json_files, load_json, save_json
 
@@ -11,6 +13,16 @@ from utils import LINEAGE_STAGES, iter_json_files, load_json, save_json
 TALKS_DIR = Path(__file__).with_name("output") / "talks"
 # Where the index will be written (one level up from talks).
 INDEX_PATH = Path(__file__).with_name("output") / "talks-index.json"
+# Alternative columnar index: parallel arrays, dictionary-encoded teachers/tags.
+COLUMNAR_INDEX_PATH = Path(__file__).with_name("output") / "talks-index-columnar.json"
+# Set to True to also write the columnar index alongside the object array.
+BUILD_COLUMNAR = False
+COLUMNAR_FORMAT_VERSION = 1
+
+EPOCH = date(1970, 1, 1)
+# Accepts "2024-07-07 12:59", "2024-07-07", "2024-07" and "2024"; time of day is dropped.
+DATE_RE = re.compile(r"^(\d{4})(?:-(\d{1,2}))?(?:-(\d{1,2}))?(?:[ T].*)?$")
+SECONDS_RE = re.compile(r"^(\d+(?:\.\d+)?)\s*s$")
 
 
 def _lineage_stage_number(data_lineage: object) -> int:
@@ -43,6 +55,117 @@ def build_index_entry(data: Dict) -> Dict:
     }
 
 
+def parse_epoch_days(value: object) -> Optional[int]:
+    """Convert a talk date into days since 1970-01-01, or None when unparseable.
+
+    A missing or zero month/day ("1981", "1981-00-00", "1981-05-00") falls on
+    the first of the year/month, so partial dates keep their year.
+    """
+    if not isinstance(value, str):
+        return None
+    match = DATE_RE.match(value.strip())
+    if not match:
+        return None
+    year, month, day = (int(part) if part else 0 for part in match.groups())
+    if not month:
+        month, day = 1, 1
+    day = day or 1
+    try:
+        return (date(year, month, day) - EPOCH).days
+    except ValueError:
+        return None
+
+
+def parse_duration_seconds(value: object) -> Optional[int]:
+    """Convert "H:MM:SS", "MM:SS" or "12.5 s" durations into whole seconds."""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    cleaned = value.strip()
+    match = SECONDS_RE.match(cleaned)
+    if match:
+        return int(round(float(match.group(1))))
+    seconds = 0
+    for part in cleaned.split(":"):
+        if not part.isdigit():
+            return None
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+def _dictionary_code(value: str, codes: Dict[str, int], values: List[str]) -> int:
+    """Return the integer code for `value`, adding it to the dictionary if new."""
+    code = codes.get(value)
+    if code is None:
+        code = len(values)
+        codes[value] = code
+        values.append(value)
+    return code
+
+
+def _nulls_last(value: Optional[int]) -> tuple:
+    return (value is None, value or 0)
+
+
+def build_columnar_index(entries: List[Dict]) -> Dict:
+    """Pivot index entries into parallel arrays with sort permutations.
+
+    `entries` must already be in row order (sorted by id). Teachers and tags are
+    stored as integer codes into `dictionaries`; tags use CSR-style offsets so
+    row i's tags are values[offsets[i]:offsets[i + 1]]. Missing dates and
+    durations are null and sort last.
+    """
+    teacher_codes: Dict[str, int] = {}
+    teachers: List[str] = []
+    tag_codes: Dict[str, int] = {}
+    tags: List[str] = []
+
+    columns: Dict[str, List] = {
+        "id": [],
+        "title": [],
+        "teacher": [],
+        "date": [],
+        "duration": [],
+        "summary": [],
+        "ts": [],
+    }
+    tag_offsets = [0]
+    tag_values: List[int] = []
+
+    for entry in entries:
+        columns["id"].append(entry["id"])
+        columns["title"].append(entry["title"])
+        columns["teacher"].append(_dictionary_code(entry["teacher"], teacher_codes, teachers))
+        columns["date"].append(parse_epoch_days(entry["date"]))
+        columns["duration"].append(parse_duration_seconds(entry["duration"]))
+        columns["summary"].append(entry["summary"])
+        columns["ts"].append(entry["ts"])
+        for tag in entry["tags"]:
+            tag_values.append(_dictionary_code(str(tag), tag_codes, tags))
+        tag_offsets.append(len(tag_values))
+
+    rows = range(len(entries))
+    dates = columns["date"]
+    durations = columns["duration"]
+    teacher_col = columns["teacher"]
+    order = {
+        "date": sorted(rows, key=lambda i: (_nulls_last(dates[i]), columns["id"][i])),
+        "duration": sorted(rows, key=lambda i: (_nulls_last(durations[i]), columns["id"][i])),
+        "teacher": sorted(
+            rows,
+            key=lambda i: (teachers[teacher_col[i]], _nulls_last(dates[i]), columns["id"][i]),
+        ),
+    }
+
+    return {
+        "version": COLUMNAR_FORMAT_VERSION,
+        "count": len(entries),
+        "dictionaries": {"teacher": teachers, "tags": tags},
+        "columns": columns,
+        "tags": {"offsets": tag_offsets, "values": tag_values},
+        "order": order,
+    }
+
+
 def main() -> None:
     if not TALKS_DIR.exists():
         raise FileNotFoundError(f"Talks directory not found: {TALKS_DIR}")
@@ -58,6 +181,10 @@ def main() -> None:
     save_json(INDEX_PATH, entries)
     print(f"Wrote {len(entries)} entries to {INDEX_PATH}")
 
+    if BUILD_COLUMNAR:
+        save_json(COLUMNAR_INDEX_PATH, build_columnar_index(entries))
+        print(f"Wrote columnar index to {COLUMNAR_INDEX_PATH}")
+
 
 if __name__ == "__main__":
     main()
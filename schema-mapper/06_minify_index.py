@@ -4,20 +4,46 @@ from __future__ import annotations
 
 from pathlib import Path
 
-from utils import load_json, save_json_compact
+from utils import (
+    load_json,
+    load_publish_manifest,
+    publish_precompressed,
+    save_json_compact,
+    save_publish_manifest,
+)
 
 # Paths for the index.
 OUTPUT_DIR = Path(__file__).with_name("output")
 INDEX_PATH = OUTPUT_DIR / "talks-index.json"
+# Written by 05_build_index.py when BUILD_COLUMNAR is enabled; minified if present.
+COLUMNAR_INDEX_PATH = OUTPUT_DIR / "talks-index-columnar.json"
+# Set to True to also emit .gz/.br siblings, a content-hashed copy and a manifest entry.
+PRECOMPRESS = False
 
 
 def main() -> None:
     if not INDEX_PATH.exists():
         raise FileNotFoundError(f"Index file not found: {INDEX_PATH}")
 
-    data = load_json(INDEX_PATH)
-    save_json_compact(INDEX_PATH, data)
-    print(f"Minified index at {INDEX_PATH}")
+    index_paths = [INDEX_PATH]
+    if COLUMNAR_INDEX_PATH.exists():
+        index_paths.append(COLUMNAR_INDEX_PATH)
+
+    manifest = load_publish_manifest() if PRECOMPRESS else {}
+    for index_path in index_paths:
+        data = load_json(index_path)
+        save_json_compact(index_path, data)
+        print(f"Minified index at {index_path}")
+
+        if not PRECOMPRESS:
+            continue
+        if publish_precompressed(index_path, manifest):
+            print(f"Precompressed index as {manifest[index_path.name]['file']}")
+        else:
+            print(f"{index_path.name} unchanged; skipped recompression.")
+
+    if PRECOMPRESS:
+        save_publish_manifest(manifest)
 
 
 if __name__ == "__main__":
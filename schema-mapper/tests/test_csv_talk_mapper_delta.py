@@ -0,0 +1,95 @@
+"""Delta ingest must not clobber fields that later steps added to a talk."""
+
+from __future__ import annotations
+
+import csv
+import importlib
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+mapper = importlib.import_module("01_csv_talk_mapper")
+
+HEADERS = ["Resource ID(s)", "Title", "Speaker", "Duration"]
+
+
+class DeltaIngestTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.csv_path = root / "export.csv"
+        self.output_dir = root / "output" / "talks"
+        self.hashes_path = root / "output" / "csv_row_hashes.json"
+        self.saved = {
+            name: getattr(mapper, name)
+            for name in ("CSV_PATH", "OUTPUT_DIR", "ROW_HASHES_PATH", "DELTA_CHANGES_PATH", "INGEST_MODE")
+        }
+        mapper.CSV_PATH = self.csv_path
+        mapper.OUTPUT_DIR = self.output_dir
+        mapper.ROW_HASHES_PATH = self.hashes_path
+        mapper.DELTA_CHANGES_PATH = root / "output" / "csv_delta_changes.json"
+
+    def tearDown(self) -> None:
+        for name, value in self.saved.items():
+            setattr(mapper, name, value)
+        self.tmp.cleanup()
+
+    def write_csv(self, rows) -> None:
+        with self.csv_path.open("w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADERS)
+            writer.writerows(rows)
+
+    def run_mapper(self, mode: str) -> None:
+        mapper.INGEST_MODE = mode
+        mapper.main()
+
+    def load(self, ref_id: str) -> dict:
+        with (self.output_dir / f"{ref_id}.json").open(encoding="utf-8") as f:
+            return json.load(f)
+
+    def enrich(self, ref_id: str) -> None:
+        """Stand in for steps 01b-03 on one talk."""
+        data = self.load(ref_id)
+        data.update(duration="0:44:46", transcript="words", audioUrl="https://example.org/1.mp3")
+        mapper.write_json(self.output_dir / f"{ref_id}.json", data)
+
+    def test_first_delta_run_keeps_enriched_talks(self) -> None:
+        self.write_csv([["1", "First", "A", "0:44:46 (approx)"], ["2", "Second", "B", "1:00:00"]])
+        self.run_mapper("full")
+        self.enrich("1")
+        self.hashes_path.unlink()
+
+        self.write_csv([
+            ["1", "First", "A", "0:44:46 (approx)"],
+            ["2", "Second", "B", "1:00:00"],
+            ["3", "Third", "C", "0:10:00"],
+        ])
+        self.run_mapper("delta")
+
+        talk = self.load("1")
+        self.assertEqual(talk["transcript"], "words")
+        self.assertEqual(talk["audioUrl"], "https://example.org/1.mp3")
+        changes = json.loads(mapper.DELTA_CHANGES_PATH.read_text(encoding="utf-8"))
+        self.assertEqual(changes["added"], ["3"])
+        self.assertEqual(changes["changed"], ["1", "2"])
+
+    def test_changed_row_keeps_normalized_duration(self) -> None:
+        self.write_csv([["1", "First", "A", "0:44:46 (approx)"]])
+        self.run_mapper("full")
+        self.enrich("1")
+
+        self.write_csv([["1", "First (revised)", "A", "0:44:46 (approx)"]])
+        self.run_mapper("delta")
+
+        talk = self.load("1")
+        self.assertEqual(talk["title"], "First (revised)")
+        self.assertEqual(talk["duration"], "0:44:46")
+        self.assertEqual(talk["transcript"], "words")
+
+
+if __name__ == "__main__":
+    unittest.main()
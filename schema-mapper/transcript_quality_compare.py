@@ -12,6 +12,11 @@ options:
                         Override model_version for a given log path (repeatable).
   --baseline BASELINE   Baseline version to compare against (defaults to first seen).
   --limit LIMIT         Limit for top regressions/improvements per comparison.
+  --store STORE         Load entries from a transcript_quality_store.py store
+                        instead of (or in addition to) log files.
+  --matrix              Compare every pair of versions at once (requires numpy).
+  --oracle              With --matrix, report the best version per talk.
+  --json JSON           With --matrix, also write the full results as JSON.
 
 """
 
@@ -19,11 +24,21 @@ from __future__ import annotations
 
 import argparse
 import json
+import math
 from dataclasses import dataclass
 from pathlib import Path
 import statistics
 from typing import Dict, Iterable, List, Optional, Tuple
 
+import transcript_quality_store
+
+try:
+    import numpy as np
+except ImportError:  # Optional: only needed for --matrix.
+    np = None
+
+SUCCEEDED = transcript_quality_store.STATUS_CODES["succeeded"]
+
 
 @dataclass
 class Entry:
@@ -109,6 +124,26 @@ def load_entries(
     return entries_by_version, warnings
 
 
+def load_store_entries(store_dir: Path) -> Dict[str, Dict[str, Entry]]:
+    entries_by_version: Dict[str, Dict[str, Entry]] = {}
+    catalog = transcript_quality_store.load_catalog(store_dir)
+    for version in sorted(catalog["versions"]):
+        columns = transcript_quality_store.read_columns(store_dir, version)
+        source_path = transcript_quality_store.version_dir(store_dir, version)
+        version_entries = entries_by_version.setdefault(version, {})
+        for idx, talk_id in enumerate(columns.talk_ids):
+            likeness = columns.likeness[idx]
+            version_entries[talk_id] = Entry(
+                talk_id=talk_id,
+                status=transcript_quality_store.STATUS_NAMES.get(columns.status[idx]),
+                likeness=None if math.isnan(likeness) else likeness,
+                selected_file=None,
+                model_version=version,
+                source_path=source_path,
+            )
+    return entries_by_version
+
+
 def summarize_entries(entries: Dict[str, Entry]) -> dict:
     all_entries = list(entries.values())
     likeness_scores = [entry.likeness for entry in all_entries if entry.likeness is not None]
@@ -198,6 +233,207 @@ def compare_versions(
     return "\n".join(lines)
 
 
+@dataclass
+class AlignedVersions:
+    """All versions aligned by talk_id: arrays are shaped (versions, talks)."""
+
+    versions: List[str]
+    talk_ids: List[str]
+    likeness: "np.ndarray"  # float64, NaN when missing
+    status: "np.ndarray"  # int8 status codes, UNKNOWN_STATUS when missing
+    present: "np.ndarray"  # bool, True where the version has an entry for the talk
+
+
+def align_versions(
+    entries_by_version: Dict[str, Dict[str, Entry]],
+    versions: List[str],
+) -> AlignedVersions:
+    talk_ids = sorted(set().union(*(entries_by_version[version] for version in versions)))
+    column = {talk_id: idx for idx, talk_id in enumerate(talk_ids)}
+    likeness = np.full((len(versions), len(talk_ids)), np.nan)
+    status = np.full(
+        (len(versions), len(talk_ids)), transcript_quality_store.UNKNOWN_STATUS, dtype=np.int8
+    )
+    present = np.zeros((len(versions), len(talk_ids)), dtype=bool)
+    for row, version in enumerate(versions):
+        for talk_id, entry in entries_by_version[version].items():
+            present[row, column[talk_id]] = True
+            if entry.likeness is not None:
+                likeness[row, column[talk_id]] = entry.likeness
+            status[row, column[talk_id]] = transcript_quality_store.STATUS_CODES.get(
+                entry.status, transcript_quality_store.UNKNOWN_STATUS
+            )
+    return AlignedVersions(versions, talk_ids, likeness, status, present)
+
+
+def compute_matrix(aligned: AlignedVersions, limit: int) -> dict:
+    """Pairwise stats for every (base, other) version pair as (V, V) arrays.
+
+    Mirrors compare_versions: a pair counts a talk as compared only when both
+    versions have a likeness, and transitions are counted over compared talks.
+    """
+    present = aligned.present
+    # deltas[i, j, t] = likeness of version j minus version i for talk t.
+    deltas = aligned.likeness[None, :, :] - aligned.likeness[:, None, :]
+    compared = ~np.isnan(deltas)
+    succeeded = aligned.status == SUCCEEDED
+    base_ok = succeeded[:, None, :]
+    other_ok = succeeded[None, :, :]
+
+    compared_count = compared.sum(axis=-1)
+    safe_count = np.maximum(compared_count, 1)
+    avg_delta = np.where(compared, deltas, 0.0).sum(axis=-1) / safe_count
+    # np.sort places NaN last, so the first compared_count values are the valid ones.
+    ordered = np.sort(deltas, axis=-1)
+    low = np.take_along_axis(ordered, ((safe_count - 1) // 2)[..., None], axis=-1)[..., 0]
+    high = np.take_along_axis(ordered, (safe_count // 2)[..., None], axis=-1)[..., 0]
+
+    k = min(limit, len(aligned.talk_ids))
+    regressions = np.argsort(np.where(deltas < 0, deltas, np.inf), axis=-1, kind="stable")[..., :k]
+    improvements = np.argsort(np.where(deltas > 0, -deltas, np.inf), axis=-1, kind="stable")[..., :k]
+
+    return {
+        "matched": (present[:, None, :] & present[None, :, :]).sum(axis=-1),
+        "compared": compared_count,
+        "improved": (deltas > 0).sum(axis=-1),
+        "regressed": (deltas < 0).sum(axis=-1),
+        "success_to_fail": (compared & base_ok & ~other_ok).sum(axis=-1),
+        "fail_to_success": (compared & ~base_ok & other_ok).sum(axis=-1),
+        "avg_delta": np.where(compared_count > 0, avg_delta, np.nan),
+        "median_delta": np.where(compared_count > 0, (low + high) / 2, np.nan),
+        "deltas": deltas,
+        "top_regressions": regressions,
+        "top_improvements": improvements,
+    }
+
+
+def compute_oracle(aligned: AlignedVersions) -> dict:
+    """Pick the highest-likeness version per talk (ties go to the earlier version)."""
+    has_score = ~np.isnan(aligned.likeness).all(axis=0)
+    best_row = np.argmax(np.where(np.isnan(aligned.likeness), -np.inf, aligned.likeness), axis=0)
+    talks = np.arange(len(aligned.talk_ids))
+    best_likeness = aligned.likeness[best_row, talks]
+    any_success = (aligned.status == SUCCEEDED).any(axis=0)
+    wins = np.bincount(best_row[has_score], minlength=len(aligned.versions))
+    return {
+        "scored_talks": int(has_score.sum()),
+        "average_likeness": float(best_likeness[has_score].mean()) if has_score.any() else None,
+        "successes": int(any_success.sum()),
+        "wins": {version: int(wins[row]) for row, version in enumerate(aligned.versions)},
+        "best": {
+            aligned.talk_ids[talk]: aligned.versions[best_row[talk]]
+            for talk in talks[has_score]
+        },
+    }
+
+
+def _matrix_table(title: str, versions: List[str], values: "np.ndarray", fmt) -> List[str]:
+    width = max(8, max(len(version) for version in versions) + 1)
+    lines = [f"{title} (row -> column):", " " * width + "".join(v.rjust(width) for v in versions)]
+    for row, version in enumerate(versions):
+        cells = "".join(
+            ("-" if row == col else fmt(values[row, col])).rjust(width)
+            for col in range(len(versions))
+        )
+        lines.append(version.ljust(width) + cells)
+    return lines
+
+
+def format_matrix(aligned: AlignedVersions, matrix: dict, baseline: str, limit: int) -> str:
+    versions = aligned.versions
+
+    def fmt_delta(value: float) -> str:
+        return "N/A" if np.isnan(value) else f"{value:+.4f}"
+
+    lines = [f"Matrix comparison: {len(versions)} versions, {len(aligned.talk_ids)} talks"]
+    lines += _matrix_table("Compared talks", versions, matrix["compared"], str)
+    lines += _matrix_table("Avg delta", versions, matrix["avg_delta"], fmt_delta)
+    lines += _matrix_table("Median delta", versions, matrix["median_delta"], fmt_delta)
+    lines += _matrix_table("Improved", versions, matrix["improved"], str)
+    lines += _matrix_table("Regressed", versions, matrix["regressed"], str)
+    lines += _matrix_table("Fail->Success", versions, matrix["fail_to_success"], str)
+    lines += _matrix_table("Success->Fail", versions, matrix["success_to_fail"], str)
+
+    base = versions.index(baseline)
+    for other, version in enumerate(versions):
+        if other == base:
+            continue
+        for label, key, sign in (
+            ("regressions", "top_regressions", -1),
+            ("improvements", "top_improvements", 1),
+        ):
+            picks = [
+                talk
+                for talk in matrix[key][base, other]
+                if sign * matrix["deltas"][base, other, talk] > 0
+            ]
+            if not picks:
+                continue
+            lines.append(f"Top {label} {baseline} -> {version} (limit {limit}):")
+            for talk in picks:
+                lines.append(
+                    f"    {aligned.talk_ids[talk]}: {aligned.likeness[base, talk]:.4f} ->"
+                    f" {aligned.likeness[other, talk]:.4f}"
+                    f" (delta {matrix['deltas'][base, other, talk]:+.4f})"
+                )
+    return "\n".join(lines)
+
+
+def format_oracle(aligned: AlignedVersions, oracle: dict) -> str:
+    lines = [
+        "Oracle (best version per talk):",
+        f"  Scored talks: {oracle['scored_talks']}",
+        f"  Average likeness: {format_float(oracle['average_likeness'])}",
+        f"  Successes (any version): {oracle['successes']}",
+        "  Wins per version:",
+    ]
+    for version in aligned.versions:
+        lines.append(f"    {version}: {oracle['wins'][version]}")
+    return "\n".join(lines)
+
+
+def matrix_to_json(aligned: AlignedVersions, matrix: dict, oracle: Optional[dict]) -> dict:
+    def nullable(value: float) -> Optional[float]:
+        return None if np.isnan(value) else round(float(value), 4)
+
+    pairs = []
+    for base, base_version in enumerate(aligned.versions):
+        for other, other_version in enumerate(aligned.versions):
+            if base == other:
+                continue
+
+            def top(key: str, sign: int) -> List[dict]:
+                return [
+                    {
+                        "talk_id": aligned.talk_ids[talk],
+                        "delta": round(float(matrix["deltas"][base, other, talk]), 4),
+                    }
+                    for talk in matrix[key][base, other]
+                    if sign * matrix["deltas"][base, other, talk] > 0
+                ]
+
+            pairs.append(
+                {
+                    "base": base_version,
+                    "other": other_version,
+                    "matched": int(matrix["matched"][base, other]),
+                    "compared": int(matrix["compared"][base, other]),
+                    "improved": int(matrix["improved"][base, other]),
+                    "regressed": int(matrix["regressed"][base, other]),
+                    "success_to_fail": int(matrix["success_to_fail"][base, other]),
+                    "fail_to_success": int(matrix["fail_to_success"][base, other]),
+                    "avg_delta": nullable(matrix["avg_delta"][base, other]),
+                    "median_delta": nullable(matrix["median_delta"][base, other]),
+                    "top_regressions": top("top_regressions", -1),
+                    "top_improvements": top("top_improvements", 1),
+                }
+            )
+    payload = {"versions": aligned.versions, "talks": len(aligned.talk_ids), "pairs": pairs}
+    if oracle is not None:
+        payload["oracle"] = oracle
+    return payload
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         description="Compare transcript quality JSONL logs across model versions.",
@@ -226,18 +462,49 @@ def main() -> None:
         default=10,
         help="Limit for top regressions/improvements per comparison.",
     )
+    parser.add_argument(
+        "--store",
+        type=Path,
+        default=None,
+        help="Load entries from a transcript_quality_store.py store directory.",
+    )
+    parser.add_argument(
+        "--matrix",
+        action="store_true",
+        help="Compare every pair of versions at once (requires numpy).",
+    )
+    parser.add_argument(
+        "--oracle",
+        action="store_true",
+        help="With --matrix, report the best version per talk.",
+    )
+    parser.add_argument(
+        "--json",
+        type=Path,
+        default=None,
+        help="With --matrix, also write the full results as JSON.",
+    )
     args = parser.parse_args()
 
+    if (args.oracle or args.json) and not args.matrix:
+        parser.error("--oracle and --json require --matrix")
+    if args.matrix and np is None:
+        raise SystemExit("--matrix requires numpy (pip install numpy).")
+
     version_map = parse_version_pairs(args.version)
     log_paths = list(args.log_paths)
     for path in version_map:
         if path not in log_paths:
             log_paths.append(path)
 
-    if not log_paths:
-        raise SystemExit("Provide at least one log path.")
+    if not log_paths and not args.store:
+        raise SystemExit("Provide at least one log path or --store.")
 
     entries_by_version, warnings = load_entries(log_paths, version_map)
+    if args.store:
+        # Log files given alongside the store take precedence per talk.
+        for version, stored in load_store_entries(args.store).items():
+            entries_by_version[version] = {**stored, **entries_by_version.get(version, {})}
     if not entries_by_version:
         raise SystemExit("No entries found in provided logs.")
 
@@ -256,19 +523,34 @@ def main() -> None:
         baseline = args.baseline or versions[0]
         if baseline not in entries_by_version:
             raise SystemExit(f"Baseline version '{baseline}' not found in logs.")
-        for other in versions:
-            if other == baseline:
-                continue
+        if args.matrix:
+            aligned = align_versions(entries_by_version, versions)
+            matrix = compute_matrix(aligned, args.limit)
+            oracle = compute_oracle(aligned) if args.oracle else None
             print()
-            print(
-                compare_versions(
-                    baseline,
-                    entries_by_version[baseline],
-                    other,
-                    entries_by_version[other],
-                    args.limit,
+            print(format_matrix(aligned, matrix, baseline, args.limit))
+            if oracle is not None:
+                print()
+                print(format_oracle(aligned, oracle))
+            if args.json:
+                with args.json.open("w", encoding="utf-8") as handle:
+                    json.dump(matrix_to_json(aligned, matrix, oracle), handle, indent=2)
+                    handle.write("\n")
+                print(f"\nWrote matrix results to {args.json}")
+        else:
+            for other in versions:
+                if other == baseline:
+                    continue
+                print()
+                print(
+                    compare_versions(
+                        baseline,
+                        entries_by_version[baseline],
+                        other,
+                        entries_by_version[other],
+                        args.limit,
+                    )
                 )
-            )
 
     if warnings:
         print()
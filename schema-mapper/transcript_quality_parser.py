@@ -33,7 +33,7 @@ import argparse
 import json
 from pathlib import Path
 import statistics
-from typing import Iterable, List
+from typing import Iterable, List, Optional
 
 
 def iter_log_entries(path: Path) -> Iterable[dict]:
@@ -52,6 +52,11 @@ def compute_statuses(likeness_scores: List[float], threshold: float) -> List[boo
     return [score >= threshold for score in likeness_scores]
 
 
+def success_rate(success_count: int, scored_count: int) -> Optional[float]:
+    """Successes over entries with a likeness score (the parser's Entries count)."""
+    return (success_count / scored_count) if scored_count else None
+
+
 def summarize_scores(scores: List[float]) -> dict:
     if not scores:
         return {
@@ -66,18 +71,21 @@ def summarize_scores(scores: List[float]) -> dict:
     }
 
 
+def distribution_bin(score: float) -> int:
+    percent = int(score * 100)
+    if percent < 0:
+        percent = 0
+    elif percent > 100:
+        percent = 100
+    if percent == 100:
+        return 10
+    return percent // 10
+
+
 def compute_distribution(scores: List[float]) -> List[int]:
     bins = [0 for _ in range(11)]
     for score in scores:
-        percent = int(score * 100)
-        if percent < 0:
-            percent = 0
-        elif percent > 100:
-            percent = 100
-        if percent == 100:
-            bins[10] += 1
-        else:
-            bins[percent // 10] += 1
+        bins[distribution_bin(score)] += 1
     return bins
 
 
@@ -121,14 +129,14 @@ def main() -> None:
     summary = summarize_scores(likeness_scores)
     success_count = sum(1 for status in statuses if status)
     total = summary["count"]
-    success_rate = (success_count / total) if total else None
+    rate = success_rate(success_count, total)
 
     print(f"Entries: {total}")
     print(f"Successes: {success_count}")
-    if success_rate is None:
+    if rate is None:
         print("Success rate: N/A")
     else:
-        print(f"Success rate: {success_rate:.4f}")
+        print(f"Success rate: {rate:.4f}")
     if summary["average"] is None:
         print("Average likeness: N/A")
         print("Median likeness: N/A")
@@ -0,0 +1,406 @@
+"""
+Compact transcript quality JSONL logs into a columnar store and query it.
+
+Each model_version gets a directory of parallel column files sorted by talk_id
+(keyed by (model_version, talk_id), last entry wins like the compare tool),
+plus precomputed aggregates: counts, the 10% distribution bins used by
+transcript_quality_parser.py and a mergeable likeness sketch. Summaries read
+only the aggregates, so they never rescan the logs. Ingest is incremental:
+only bytes appended to a log since the last ingest are read.
+
+Example runs:
+
+python3 transcript_quality_store.py ingest output/transcript_quality_local_*.log
+
+python3 transcript_quality_store.py summary v3 v4 --quantiles 0.1,0.9
+Version summaries:
+- v3
+  Entries: 54
+  Successes: 18
+  Success rate: 0.3333
+  Average likeness: 0.8017
+  Median likeness: 0.8096
+  p10 likeness: <...>
+  p90 likeness: <...>
+- v4
+  ...
+
+---
+merge several versions into one summary, recounting successes at a threshold
+python3 transcript_quality_store.py summary --merge --threshold 0.95 --distribution
+
+transcript_quality_compare.py accepts --store to load entries from here.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+from array import array
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from transcript_quality_parser import distribution_bin, render_distribution, success_rate
+from utils import load_json, save_json
+
+DEFAULT_STORE_DIR = Path(__file__).with_name("output") / "quality_store"
+CATALOG_NAME = "catalog.json"
+STATS_NAME = "stats.json"
+TALK_ID_COLUMN = "talk_id.json"
+LIKENESS_COLUMN = "likeness.f64"
+STATUS_COLUMN = "status.i8"
+# Likeness is logged rounded to 4 decimals, so this resolution keeps the sketch exact.
+SKETCH_RESOLUTION = 10_000
+STATUS_CODES = {"succeeded": 1, "failed": 0}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+UNKNOWN_STATUS = -1
+
+
+@dataclass
+class LikenessSketch:
+    """Mergeable histogram of likeness scores at SKETCH_RESOLUTION buckets."""
+
+    counts: Dict[int, int] = field(default_factory=dict)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def add(self, score: float, weight: int = 1) -> None:
+        bucket = round(score * SKETCH_RESOLUTION)
+        self.counts[bucket] = self.counts.get(bucket, 0) + weight
+
+    def merge(self, other: "LikenessSketch") -> None:
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+
+    def mean(self) -> Optional[float]:
+        total = self.total
+        if not total:
+            return None
+        weighted = sum(bucket * count for bucket, count in self.counts.items())
+        return weighted / total / SKETCH_RESOLUTION
+
+    def _values_at_ranks(self, ranks: List[int]) -> List[float]:
+        values: List[float] = []
+        pending = sorted(ranks)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            while pending and pending[0] < seen:
+                values.append(bucket / SKETCH_RESOLUTION)
+                pending.pop(0)
+            if not pending:
+                break
+        return values
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Linear interpolation between ranks; q=0.5 matches statistics.median."""
+        total = self.total
+        if not total:
+            return None
+        position = q * (total - 1)
+        low, high = math.floor(position), math.ceil(position)
+        low_value, high_value = self._values_at_ranks([low, high])
+        return low_value + (high_value - low_value) * (position - low)
+
+    def count_at_least(self, threshold: float) -> int:
+        return sum(
+            count for bucket, count in self.counts.items() if bucket / SKETCH_RESOLUTION >= threshold
+        )
+
+    def distribution(self) -> List[int]:
+        bins = [0 for _ in range(11)]
+        for bucket, count in self.counts.items():
+            bins[distribution_bin(bucket / SKETCH_RESOLUTION)] += count
+        return bins
+
+    def to_json(self) -> Dict[str, int]:
+        return {str(bucket): count for bucket, count in sorted(self.counts.items())}
+
+    @classmethod
+    def from_json(cls, payload: Dict[str, int]) -> "LikenessSketch":
+        return cls({int(bucket): count for bucket, count in payload.items()})
+
+
+@dataclass
+class VersionStats:
+    total: int = 0
+    successes: int = 0
+    sketch: LikenessSketch = field(default_factory=LikenessSketch)
+
+    def merge(self, other: "VersionStats") -> None:
+        self.total += other.total
+        self.successes += other.successes
+        self.sketch.merge(other.sketch)
+
+    def to_json(self) -> dict:
+        return {
+            "total": self.total,
+            "successes": self.successes,
+            "distribution": self.sketch.distribution(),
+            "sketch": self.sketch.to_json(),
+        }
+
+    @classmethod
+    def from_json(cls, payload: dict) -> "VersionStats":
+        return cls(
+            total=payload["total"],
+            successes=payload["successes"],
+            sketch=LikenessSketch.from_json(payload["sketch"]),
+        )
+
+
+@dataclass
+class VersionColumns:
+    """Parallel columns for one model_version, sorted by talk_id."""
+
+    talk_ids: List[str]
+    likeness: array  # float64, NaN when missing
+    status: array  # int8, see STATUS_CODES / UNKNOWN_STATUS
+
+    def rows(self) -> Dict[str, Tuple[float, int]]:
+        return {
+            talk_id: (self.likeness[idx], self.status[idx])
+            for idx, talk_id in enumerate(self.talk_ids)
+        }
+
+    @classmethod
+    def from_rows(cls, rows: Dict[str, Tuple[float, int]]) -> "VersionColumns":
+        talk_ids = sorted(rows)
+        return cls(
+            talk_ids=talk_ids,
+            likeness=array("d", (rows[talk_id][0] for talk_id in talk_ids)),
+            status=array("b", (rows[talk_id][1] for talk_id in talk_ids)),
+        )
+
+    def compute_stats(self) -> VersionStats:
+        stats = VersionStats(total=len(self.talk_ids))
+        stats.successes = sum(1 for code in self.status if code == STATUS_CODES["succeeded"])
+        for score in self.likeness:
+            if not math.isnan(score):
+                stats.sketch.add(score)
+        return stats
+
+
+def version_dir(store_dir: Path, version: str) -> Path:
+    safe = "".join(char if char.isalnum() or char in "._-" else "_" for char in version)
+    return store_dir / "versions" / safe
+
+
+def load_catalog(store_dir: Path) -> dict:
+    path = store_dir / CATALOG_NAME
+    if not path.exists():
+        return {"sources": {}, "versions": {}}
+    return load_json(path)
+
+
+def save_catalog(store_dir: Path, catalog: dict) -> None:
+    store_dir.mkdir(parents=True, exist_ok=True)
+    save_json(store_dir / CATALOG_NAME, catalog)
+
+
+def read_columns(store_dir: Path, version: str) -> VersionColumns:
+    directory = version_dir(store_dir, version)
+    if not (directory / TALK_ID_COLUMN).exists():
+        return VersionColumns([], array("d"), array("b"))
+    talk_ids = load_json(directory / TALK_ID_COLUMN)
+    likeness = array("d")
+    status = array("b")
+    likeness.frombytes((directory / LIKENESS_COLUMN).read_bytes())
+    status.frombytes((directory / STATUS_COLUMN).read_bytes())
+    return VersionColumns(talk_ids, likeness, status)
+
+
+def write_columns(store_dir: Path, version: str, columns: VersionColumns) -> VersionStats:
+    directory = version_dir(store_dir, version)
+    directory.mkdir(parents=True, exist_ok=True)
+    with (directory / TALK_ID_COLUMN).open("w", encoding="utf-8") as handle:
+        json.dump(columns.talk_ids, handle, separators=(",", ":"))
+    (directory / LIKENESS_COLUMN).write_bytes(columns.likeness.tobytes())
+    (directory / STATUS_COLUMN).write_bytes(columns.status.tobytes())
+    stats = columns.compute_stats()
+    save_json(directory / STATS_NAME, stats.to_json())
+    return stats
+
+
+def read_stats(store_dir: Path, version: str) -> VersionStats:
+    return VersionStats.from_json(load_json(version_dir(store_dir, version) / STATS_NAME))
+
+
+def coerce_likeness(value: object) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def read_new_lines(path: Path, offset: int) -> Tuple[List[Tuple[int, dict]], int]:
+    """Parse complete lines appended after `offset`; returns (entries, new offset)."""
+    if path.stat().st_size < offset:
+        # The log was replaced or truncated; start over.
+        offset = 0
+    with path.open("rb") as handle:
+        handle.seek(offset)
+        data = handle.read()
+    complete = data[: data.rfind(b"\n") + 1]
+    entries: List[Tuple[int, dict]] = []
+    for line_number, line in enumerate(complete.decode("utf-8").splitlines(), start=1):
+        stripped = line.strip()
+        if not stripped:
+            continue
+        try:
+            entries.append((line_number, json.loads(stripped)))
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"Invalid JSON on line {line_number} after byte {offset} in {path}") from exc
+    return entries, offset + len(complete)
+
+
+def ingest_logs(store_dir: Path, log_paths: Iterable[Path]) -> Dict[str, int]:
+    """Fold new log lines into the store; returns updated row counts per version."""
+    catalog = load_catalog(store_dir)
+    updates: Dict[str, Dict[str, Tuple[float, int]]] = {}
+
+    for path in log_paths:
+        key = str(path.resolve())
+        source = catalog["sources"].get(key, {"offset": 0})
+        entries, offset = read_new_lines(path, source["offset"])
+        for line_number, payload in entries:
+            talk_id = payload.get("talk_id")
+            if not talk_id:
+                print(f"[skip] {path}:{line_number}: missing talk_id")
+                continue
+            version = payload.get("model_version") or "unknown"
+            updates.setdefault(version, {})[str(talk_id)] = (
+                coerce_likeness(payload.get("likeness")),
+                STATUS_CODES.get(payload.get("status"), UNKNOWN_STATUS),
+            )
+        catalog["sources"][key] = {"offset": offset}
+
+    for version, rows in updates.items():
+        merged = read_columns(store_dir, version).rows()
+        merged.update(rows)
+        stats = write_columns(store_dir, version, VersionColumns.from_rows(merged))
+        catalog["versions"][version] = {"total": stats.total}
+
+    save_catalog(store_dir, catalog)
+    return {version: len(rows) for version, rows in updates.items()}
+
+
+def format_float(value: Optional[float]) -> str:
+    if value is None:
+        return "N/A"
+    return f"{value:.4f}"
+
+
+def parse_quantiles(raw: str) -> List[float]:
+    quantiles = [float(part) for part in raw.split(",") if part.strip()]
+    for q in quantiles:
+        if not 0.0 <= q <= 1.0:
+            raise ValueError(f"Quantile {q} must be between 0 and 1.")
+    return quantiles
+
+
+def print_summary(
+    label: str,
+    stats: VersionStats,
+    quantiles: List[float],
+    threshold: Optional[float],
+    show_distribution: bool,
+) -> None:
+    successes = stats.successes
+    if threshold is not None:
+        successes = stats.sketch.count_at_least(threshold)
+    print(f"- {label}")
+    print(f"  Entries: {stats.total}")
+    if stats.sketch.total != stats.total:
+        print(f"  With likeness: {stats.sketch.total}")
+    print(f"  Successes: {successes}")
+    # Same denominator as transcript_quality_parser.py: entries with a likeness score.
+    print(f"  Success rate: {format_float(success_rate(successes, stats.sketch.total))}")
+    print(f"  Average likeness: {format_float(stats.sketch.mean())}")
+    print(f"  Median likeness: {format_float(stats.sketch.quantile(0.5))}")
+    for q in quantiles:
+        print(f"  p{q * 100:g} likeness: {format_float(stats.sketch.quantile(q))}")
+    if show_distribution and stats.sketch.total:
+        render_distribution(stats.sketch.distribution())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Ingest transcript quality logs into a columnar store and summarize them.",
+    )
+    parser.add_argument(
+        "--store",
+        type=Path,
+        default=DEFAULT_STORE_DIR,
+        help=f"Store directory (default: {DEFAULT_STORE_DIR}).",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest = subparsers.add_parser("ingest", help="Fold new log lines into the store.")
+    ingest.add_argument("log_paths", nargs="+", type=Path, help="Path(s) to JSONL log files.")
+
+    summary = subparsers.add_parser("summary", help="Summarize versions from stored aggregates.")
+    summary.add_argument(
+        "versions",
+        nargs="*",
+        help="Versions to summarize (default: all stored versions).",
+    )
+    summary.add_argument(
+        "--merge",
+        action="store_true",
+        help="Merge the selected versions into a single summary.",
+    )
+    summary.add_argument(
+        "--threshold",
+        type=float,
+        default=None,
+        help="Recalculate success/failure using this likeness threshold.",
+    )
+    summary.add_argument(
+        "--quantiles",
+        default="",
+        help="Comma-separated likeness quantiles to report, e.g. 0.1,0.9.",
+    )
+    summary.add_argument(
+        "--distribution",
+        action="store_true",
+        help="Render the quality distribution for each summary.",
+    )
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        updated = ingest_logs(args.store, args.log_paths)
+        if not updated:
+            print("No new entries.")
+        for version, count in sorted(updated.items()):
+            print(f"Ingested {count} entr{'y' if count == 1 else 'ies'} for {version}")
+        return
+
+    catalog = load_catalog(args.store)
+    versions = args.versions or sorted(catalog["versions"])
+    missing = [version for version in versions if version not in catalog["versions"]]
+    if missing:
+        raise SystemExit(f"Version(s) not found in store: {', '.join(missing)}")
+    if not versions:
+        raise SystemExit("Store is empty; run the ingest command first.")
+
+    quantiles = parse_quantiles(args.quantiles)
+    print("Version summaries:")
+    if args.merge:
+        merged = VersionStats()
+        for version in versions:
+            merged.merge(read_stats(args.store, version))
+        print_summary("+".join(versions), merged, quantiles, args.threshold, args.distribution)
+        return
+    for version in versions:
+        print_summary(
+            version, read_stats(args.store, version), quantiles, args.threshold, args.distribution
+        )
+
+
+if __name__ == "__main__":
+    main()
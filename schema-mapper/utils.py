@@ -2,10 +2,17 @@
 
 from __future__ import annotations
 
+import gzip
+import hashlib
 import json
 from pathlib import Path
 from typing import Dict, Iterator
 
+try:
+    import brotli
+except ImportError:  # Optional: only needed for .br output.
+    brotli = None
+
 LINEAGE_STAGES = [
     "audio_original",
     "transcript_raw",
@@ -13,6 +20,13 @@ LINEAGE_STAGES = [
     "transcript_cleaned",
 ]
 
+# Root for generated output and the web-ready copies built from it.
+OUTPUT_ROOT = Path(__file__).with_name("output")
+PUBLISH_DIR = OUTPUT_ROOT / "public"
+PUBLISH_MANIFEST_PATH = PUBLISH_DIR / "manifest.json"
+# Number of hex characters of the sha256 digest used in hashed filenames.
+CONTENT_HASH_LENGTH = 12
+
 
 def iter_json_files(directory: Path) -> Iterator[Path]:
     """Yield JSON files in a deterministic order."""
@@ -38,3 +52,89 @@ def save_json_compact(path: Path, data: Dict) -> None:
     """Write a JSON file without unnecessary whitespace (good for web serving)."""
     with path.open("w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+
+
+def content_hash(data: bytes) -> str:
+    """Return a short, filename-safe digest of the given bytes."""
+    return hashlib.sha256(data).hexdigest()[:CONTENT_HASH_LENGTH]
+
+
+def load_publish_manifest(path: Path = PUBLISH_MANIFEST_PATH) -> Dict:
+    """Read the publish manifest, or an empty one if it does not exist yet."""
+    if not path.exists():
+        return {}
+    return load_json(path)
+
+
+def save_publish_manifest(manifest: Dict, path: Path = PUBLISH_MANIFEST_PATH) -> None:
+    """Persist the publish manifest next to the hashed files."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    save_json(path, manifest)
+
+
+def _variant_suffixes() -> tuple:
+    """Compressed siblings this run produces (.br only when brotli is installed)."""
+    return (".gz", ".br") if brotli is not None else (".gz",)
+
+
+def _compressed_variants(data: bytes) -> Dict[str, bytes]:
+    """Compress at maximum settings; mtime=0 keeps gzip output reproducible."""
+    variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(data, quality=11)
+    return variants
+
+
+def _remove_published(path: Path) -> None:
+    """Delete a published file along with its compressed siblings."""
+    for candidate in (path, path.with_name(path.name + ".gz"), path.with_name(path.name + ".br")):
+        if candidate.exists():
+            candidate.unlink()
+
+
+def publish_precompressed(path: Path, manifest: Dict, root: Path = OUTPUT_ROOT) -> bool:
+    """Emit .gz/.br siblings and a content-hashed copy of `path` under PUBLISH_DIR.
+
+    Files whose hash matches the manifest entry are left alone. Returns True when
+    new output was written.
+    """
+    data = path.read_bytes()
+    digest = content_hash(data)
+    key = path.relative_to(root).as_posix()
+    hashed_rel = Path(key).with_name(f"{path.stem}.{digest}{path.suffix}").as_posix()
+    hashed_path = PUBLISH_DIR / hashed_rel
+
+    targets = (path, hashed_path)
+    suffixes = _variant_suffixes()
+    expected = [hashed_path] + [t.with_name(t.name + s) for t in targets for s in suffixes]
+    # A .br left by an earlier run with brotli would be served in place of the new content.
+    stale = [t.with_name(t.name + ".br") for t in targets] if ".br" not in suffixes else []
+
+    previous = manifest.get(key)
+    unchanged = previous and previous.get("hash") == digest
+    if (
+        unchanged
+        and all(candidate.exists() for candidate in expected)
+        and not any(candidate.exists() for candidate in stale)
+    ):
+        return False
+    if previous and previous.get("file") and previous["file"] != hashed_rel:
+        _remove_published(PUBLISH_DIR / previous["file"])
+
+    variants = _compressed_variants(data)
+    hashed_path.parent.mkdir(parents=True, exist_ok=True)
+    hashed_path.write_bytes(data)
+    for target in targets:
+        for suffix, payload in variants.items():
+            target.with_name(target.name + suffix).write_bytes(payload)
+    for candidate in stale:
+        if candidate.exists():
+            candidate.unlink()
+
+    manifest[key] = {
+        "hash": digest,
+        "file": hashed_rel,
+        "size": len(data),
+        "sizes": {suffix.lstrip("."): len(payload) for suffix, payload in variants.items()},
+    }
+    return True
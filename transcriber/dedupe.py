@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""Find re-uploads and duplicate recordings before they are transcribed.
+
+Every talk gets two fingerprints of its decoded audio: a sha256 of the PCM
+(identical audio under a different ref id or ID3 tag) and a sub-band energy
+fingerprint (the same recording re-encoded or trimmed differently). Talks that
+match an earlier one are recorded in a lineage file as duplicates of that
+canonical talk; only canonical talks are transcribed and cleaned, and
+duplicates get symlinks to the canonical outputs afterwards.
+
+A new talk is not compared with every canonical one: an inverted index from
+sub-fingerprint halves to (talk, frame) picks the talks and offsets where its
+sub-fingerprints reappear, and only those get the full bit-error comparison.
+"""
+import argparse
+import collections
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+import whisper
+
+import pcm_cache
+from segments import SAMPLE_RATE
+
+# Fingerprints only look at 300-2000 Hz, so work on audio decimated to 4 kHz.
+DECIMATE = 4
+FINGERPRINT_RATE = SAMPLE_RATE // DECIMATE
+FRAME = 512
+# A small hop (heavy overlap) keeps copies that start mid-frame aligned.
+HOP = 64
+BANDS = 33
+LOW_HZ = 300.0
+HIGH_HZ = 1900.0
+BLOCK_FRAMES = 8192
+
+# Bit error rate below which two fingerprints are the same recording.
+MATCH_BER = 0.35
+# How far apart two copies may start, e.g. a re-upload with the intro trimmed.
+MAX_OFFSET_SECONDS = 10.0
+# Offsets are searched on this much audio, then confirmed on the whole overlap.
+SEARCH_SECONDS = 180.0
+# Every INDEX_STRIDE-th frame of a canonical talk's head is indexed; lookups
+# use every frame of the new talk, so any alignment still collects hits.
+INDEX_STRIDE = 4
+# Each 32-bit sub-fingerprint is indexed as its two 16-bit halves: at the
+# MATCH_BER a whole word almost never survives intact, but a half often does.
+KEY_BITS = 16
+# Index hits at one (talk, offset) before the full comparison runs.
+MIN_VOTES = 2
+MAX_CANDIDATES = 8
+# Values this common (silence, hum) say nothing about where two talks align.
+MAX_POSTINGS = 1000
+MATCH_EXACT = "exact"
+MATCH_FINGERPRINT = "fingerprint"
+FRAMES_PER_SECOND = FINGERPRINT_RATE / HOP
+
+
+def pcm_hash(audio):
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+    return hashlib.sha256(pcm.tobytes()).hexdigest()
+
+
+def _band_edges():
+    edges_hz = np.geomspace(LOW_HZ, HIGH_HZ, BANDS + 1)
+    return np.round(edges_hz * FRAME / FINGERPRINT_RATE).astype(int)
+
+
+def fingerprint(audio):
+    """One uint32 per hop: the sign of the band-energy difference, taken across
+    neighbouring bands and then across time (Haitsma-Kalker style), which
+    survives re-encoding, volume changes and mild EQ."""
+    usable = len(audio) - len(audio) % DECIMATE
+    audio = np.asarray(audio[:usable], dtype=np.float32).reshape(-1, DECIMATE).mean(axis=1)
+    count = 1 + (len(audio) - FRAME) // HOP if len(audio) >= FRAME else 0
+    if count < 2:
+        return np.zeros(0, dtype=np.uint32)
+    edges = _band_edges()
+    window = np.hanning(FRAME).astype(np.float32)
+    energies = np.empty((count, BANDS), dtype=np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(audio, FRAME)[::HOP]
+    for first in range(0, count, BLOCK_FRAMES):
+        block = frames[first:first + BLOCK_FRAMES] * window
+        power = np.abs(np.fft.rfft(block, axis=1)) ** 2
+        cumulative = np.cumsum(power, axis=1)
+        band = cumulative[:, edges[1:] - 1] - cumulative[:, edges[:-1] - 1]
+        energies[first:first + len(block)] = np.log(band + 1e-10)
+    across_bands = energies[:, :-1] - energies[:, 1:]
+    bits = (across_bands[1:] - across_bands[:-1]) > 0
+    return np.packbits(bits, axis=1, bitorder="little").view(np.uint32).ravel()
+
+
+def _bit_errors(a, b):
+    diff = np.bitwise_xor(a, b)
+    if hasattr(np, "bitwise_count"):  # numpy >= 2.0
+        return int(np.bitwise_count(diff).sum())
+    return int(np.unpackbits(diff.view(np.uint8)).sum())
+
+
+def _ber_at(a, b, offset):
+    """Bit error rate when frame `offset` of `a` lines up with frame 0 of `b`
+    (negative: frame -offset of `b` lines up with frame 0 of `a`)."""
+    if offset >= 0:
+        a, b = a[offset:], b
+    else:
+        a, b = a, b[-offset:]
+    length = min(len(a), len(b))
+    if length == 0:
+        return 1.0
+    return _bit_errors(a[:length], b[:length]) / (32 * length)
+
+
+def _index_keys(prints):
+    """Per frame, its low and high KEY_BITS halves (the high half tagged so the
+    two never collide)."""
+    prints = np.asarray(prints, dtype=np.int64)
+    mask = (1 << KEY_BITS) - 1
+    return np.stack([prints & mask, (prints >> KEY_BITS) | (1 << KEY_BITS)], axis=1).tolist()
+
+
+def _search_frames():
+    """(largest offset, search window) in fingerprint frames."""
+    return int(MAX_OFFSET_SECONDS * FRAMES_PER_SECOND), int(SEARCH_SECONDS * FRAMES_PER_SECOND)
+
+
+def compare(a, b, offsets=None):
+    """Return (ber, offset_frames) for the best alignment of two fingerprints,
+    trying `offsets` (default: every offset up to MAX_OFFSET_SECONDS)."""
+    limit, window = _search_frames()
+    offsets = [offset for offset in (offsets or range(-limit, limit + 1)) if -limit <= offset <= limit]
+    head_a, head_b = a[:window + limit], b[:window + limit]
+    best = min(offsets, key=lambda offset: _ber_at(head_a, head_b, offset))
+    return _ber_at(a, b, best), best
+
+
+class FingerprintIndex:
+    """Lineage file plus fingerprints of every canonical talk.
+
+    Talks are registered in the order they arrive, so the first copy seen
+    becomes canonical. Safe to share between threads.
+    """
+
+    def __init__(self, path, cache=None):
+        self.path = path
+        self.fingerprint_dir = os.path.join(os.path.dirname(os.path.abspath(path)), "fingerprints")
+        self.cache = cache
+        self.talks = {}
+        self.duplicates = {}
+        self._fingerprints = {}
+        # Built on the first match: sub-fingerprint value -> [(talk number, frame)].
+        self._postings = None
+        self._indexed = []
+        self._digests = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.talks = data.get("talks", {})
+            self.duplicates = data.get("duplicates", {})
+
+    def canonical(self, ref_id):
+        entry = self.duplicates.get(ref_id)
+        return entry["canonical"] if entry else ref_id
+
+    def is_duplicate(self, ref_id):
+        return ref_id in self.duplicates
+
+    def _fingerprint_path(self, ref_id):
+        return os.path.join(self.fingerprint_dir, f"{ref_id}.npy")
+
+    def _load_fingerprint(self, ref_id):
+        if ref_id not in self._fingerprints:
+            self._fingerprints[ref_id] = np.load(self._fingerprint_path(ref_id))
+        return self._fingerprints[ref_id]
+
+    def add(self, ref_id, audio_path):
+        """Register a talk; returns its duplicate entry, or None if it is canonical."""
+        if ref_id in self.duplicates:
+            return self.duplicates[ref_id]
+        if ref_id in self.talks:
+            return None
+        audio = self.cache.load(audio_path) if self.cache else whisper.load_audio(audio_path)
+        digest = pcm_hash(audio)
+        prints = fingerprint(audio)
+        duration = len(audio) / SAMPLE_RATE
+        with self._lock:
+            match = self._match(digest, prints, duration)
+            if match:
+                self.duplicates[ref_id] = match
+            else:
+                os.makedirs(self.fingerprint_dir, exist_ok=True)
+                np.save(self._fingerprint_path(ref_id), prints)
+                self._fingerprints[ref_id] = prints
+                self.talks[ref_id] = {"pcm_sha256": digest, "duration": round(duration, 2)}
+                self._index_talk(ref_id, self.talks[ref_id], prints)
+            self.save()
+        return match
+
+    def _index_talk(self, ref_id, talk, prints):
+        self._digests.setdefault(talk["pcm_sha256"], ref_id)
+        number = len(self._indexed)
+        self._indexed.append(ref_id)
+        limit, window = _search_frames()
+        # Offsets reach `limit` either way, so the canonical side needs that much more head.
+        head = _index_keys(prints[:window + 2 * limit:INDEX_STRIDE])
+        for position, keys in enumerate(head):
+            for key in keys:
+                self._postings.setdefault(key, []).append((number, position * INDEX_STRIDE))
+
+    def _ensure_index(self):
+        if self._postings is not None:
+            return
+        self._postings = {}
+        for ref_id, talk in self.talks.items():
+            self._index_talk(ref_id, talk, self._load_fingerprint(ref_id))
+
+    def _candidates(self, prints):
+        """[(ref_id, offset_frames)] of canonical talks sharing at least
+        MIN_VOTES sub-fingerprint halves with `prints` at one offset, most
+        hits first."""
+        limit, window = _search_frames()
+        votes = collections.Counter()
+        for position, keys in enumerate(_index_keys(prints[:window + limit])):
+            for key in keys:
+                postings = self._postings.get(key)
+                if not postings or len(postings) > MAX_POSTINGS:
+                    continue
+                for number, other_position in postings:
+                    offset = other_position - position
+                    if -limit <= offset <= limit:
+                        votes[number, offset] += 1
+        found = {}
+        for (number, offset), count in votes.most_common():
+            if count < MIN_VOTES or len(found) >= MAX_CANDIDATES:
+                break
+            found.setdefault(number, offset)
+        return [(self._indexed[number], offset) for number, offset in found.items()]
+
+    def _match(self, digest, prints, duration):
+        self._ensure_index()
+        if digest in self._digests:
+            return {"canonical": self._digests[digest], "match": MATCH_EXACT, "ber": 0.0, "offset_seconds": 0.0}
+        best = None
+        tolerance = max(MAX_OFFSET_SECONDS, 0.03 * duration)
+        for other, offset in self._candidates(prints):
+            if abs(self.talks[other]["duration"] - duration) > tolerance:
+                continue
+            # Re-encoding can shift the hits by a frame, so check the neighbours too.
+            ber, offset = compare(self._load_fingerprint(other), prints, range(offset - 1, offset + 2))
+            if ber < MATCH_BER and (best is None or ber < best["ber"]):
+                best = {
+                    "canonical": other,
+                    "match": MATCH_FINGERPRINT,
+                    "ber": round(ber, 4),
+                    # How much later the duplicate's audio starts than the canonical's.
+                    "offset_seconds": round(-offset / FRAMES_PER_SECOND, 2),
+                }
+        return best
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "talks": self.talks, "duplicates": self.duplicates}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        os.replace(tmp_path, self.path)
+
+    def link(self, directory):
+        """Symlink each duplicate's outputs (`<ref>.txt`, `<ref>_cleaned.txt`, ...)
+        to the canonical talk's; returns how many links were made."""
+        names = os.listdir(directory)
+        made = 0
+        for ref_id, entry in self.duplicates.items():
+            canonical = entry["canonical"]
+            for name in names:
+                suffix = name[len(canonical):]
+                if not name.startswith(canonical) or suffix[:1] not in (".", "_"):
+                    continue
+                link_path = os.path.join(directory, ref_id + suffix)
+                if os.path.lexists(link_path):
+                    continue
+                os.symlink(name, link_path)
+                made += 1
+        return made
+
+
+def ref_id_of(audio_path):
+    return os.path.splitext(os.path.basename(audio_path))[0]
+
+
+def scan(args):
+    cache = None
+    if args.pcm_cache:
+        cache = pcm_cache.PcmCache(args.pcm_cache, int(args.pcm_cache_gb * 1024 ** 3))
+    index = FingerprintIndex(args.lineage, cache)
+    names = [name for name in os.listdir(args.audio_dir) if name.lower().endswith(".mp3")]
+    # Oldest (lowest) ref id first, so the original upload is the canonical copy.
+    names.sort(key=lambda name: (len(ref_id_of(name)), name))
+    for name in names:
+        ref_id = ref_id_of(name)
+        try:
+            match = index.add(ref_id, os.path.join(args.audio_dir, name))
+        except Exception as exc:
+            print(f"❌ {name}: {exc}")
+            continue
+        if match:
+            print(
+                f"🔁 {ref_id} duplicates {match['canonical']} "
+                f"({match['match']}, ber={match['ber']}, offset={match['offset_seconds']}s)"
+            )
+    saved = sum(index.talks[entry["canonical"]]["duration"] for entry in index.duplicates.values())
+    print(
+        f"✅ {len(index.talks)} canonical talk(s), {len(index.duplicates)} duplicate(s); "
+        f"{saved / 3600:.1f}h of audio need no transcription"
+    )
+
+
+def link(args):
+    index = FingerprintIndex(args.lineage)
+    for directory in args.dirs:
+        print(f"🔗 {directory}: {index.link(directory)} link(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Group duplicate recordings so each is transcribed once.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    scan_parser = subparsers.add_parser("scan", help="Fingerprint downloaded MP3s and update the lineage file.")
+    scan_parser.add_argument("--audio-dir", required=True)
+    scan_parser.add_argument("--lineage", default="lineage.json")
+    scan_parser.add_argument("--pcm-cache", default=None, help="Reuse/fill the decoded-audio cache.")
+    scan_parser.add_argument("--pcm-cache-gb", type=float, default=20.0)
+    scan_parser.set_defaults(func=scan)
+
+    link_parser = subparsers.add_parser(
+        "link", help="Symlink duplicates' outputs to their canonical talk's in each directory."
+    )
+    link_parser.add_argument("--lineage", default="lineage.json")
+    link_parser.add_argument("dirs", nargs="+")
+    link_parser.set_defaults(func=link)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""On-disk cache of decoded 16 kHz PCM, shared by every run and model size.
+
+Decoding an MP3 through ffmpeg costs the same whether the next step is turbo or
+large, so each talk is decoded once, stored as a compact int16/float16 .npy
+keyed by the hash of the MP3, and memory-mapped on later runs. Cached audio
+stays mapped: it is converted to float32 only a slice at a time, where it is
+used (see PcmAudio).
+"""
+import collections
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import whisper
+
+DTYPES = ("int16", "float16")
+INT16_SCALE = 32768.0
+
+
+def file_hash(path, block_size=1024 * 1024):
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class PcmAudio:
+    """Memory-mapped cached PCM that reads as float32 audio.
+
+    Slicing converts just that range; numpy functions (and np.asarray) given
+    the whole object convert all of it. len() is the number of samples.
+    """
+
+    def __init__(self, pcm, scale=1.0):
+        self.pcm = pcm
+        self.scale = scale
+
+    def __len__(self):
+        return len(self.pcm)
+
+    def __getitem__(self, index):
+        return self._to_float(self.pcm[index])
+
+    def __array__(self, dtype=None, copy=None):
+        audio = self._to_float(self.pcm)
+        return audio if dtype is None else audio.astype(dtype, copy=False)
+
+    def _to_float(self, pcm):
+        # Reading into a new float32 array is the only copy made of the mapped data.
+        audio = np.asarray(pcm, dtype=np.float32)
+        if self.scale != 1.0:
+            audio /= self.scale
+        return audio
+
+
+class PcmCache:
+    """Bounded directory of `<hash[:2]>/<hash>.<dtype>.npy` files, evicting the
+    least recently used once it grows past `max_bytes`."""
+
+    def __init__(self, root, max_bytes, dtype="int16"):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {DTYPES}")
+        self.root = root
+        self.max_bytes = max_bytes
+        self.dtype = dtype
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.{self.dtype}.npy")
+
+    def load(self, audio_path):
+        """Float32 PCM for `audio_path` (a PcmAudio on a hit), decoding and
+        caching it on a miss."""
+        cached = self.path_for(file_hash(audio_path))
+        if os.path.exists(cached):
+            return self.open(cached)
+        audio = whisper.load_audio(audio_path)
+        self._store(cached, audio)
+        return audio
+
+    def open(self, cached):
+        """Memory-map a cached file as PcmAudio, without reading it yet."""
+        # Touch it so eviction sees it as recently used.
+        os.utime(cached)
+        return PcmAudio(np.load(cached, mmap_mode="r"), INT16_SCALE if self.dtype == "int16" else 1.0)
+
+    def prefetch(self, audio_path):
+        """Make sure `audio_path` is cached, without returning the audio."""
+        cached = self.path_for(file_hash(audio_path))
+        if not os.path.exists(cached):
+            self._store(cached, whisper.load_audio(audio_path))
+        return cached
+
+    def _store(self, cached, audio):
+        if self.dtype == "int16":
+            pcm = (np.clip(audio, -1.0, 1.0) * (INT16_SCALE - 1)).astype(np.int16)
+        else:
+            pcm = audio.astype(np.float16)
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        # Write then rename, so a concurrent reader never maps a half-written file.
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cached), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, pcm)
+        os.replace(tmp_path, cached)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if not name.endswith(".npy"):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class Prefetcher:
+    """Decode the next `lookahead` files into the cache on background threads
+    while the model works on the current one.
+
+    Iterating yields (audio_path, audio, error) in the original order.
+    """
+
+    def __init__(self, cache, paths, workers=2, lookahead=4):
+        self.cache = cache
+        self.paths = paths
+        self.workers = workers
+        self.lookahead = lookahead
+
+    def __iter__(self):
+        pending = collections.deque()
+        paths = iter(self.paths)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                while len(pending) < self.lookahead:
+                    audio_path = next(paths, None)
+                    if audio_path is None:
+                        break
+                    pending.append((audio_path, executor.submit(self.cache.prefetch, audio_path)))
+                if not pending:
+                    return
+                audio_path, future = pending.popleft()
+                try:
+                    cached = future.result()
+                    audio = self.cache.open(cached) if os.path.exists(cached) else self.cache.load(audio_path)
+                    yield audio_path, audio, None
+                except Exception as exc:
+                    yield audio_path, None, exc
@@ -0,0 +1,131 @@
+"""Split long talks at silences and stitch per-chunk Whisper results back together."""
+import re
+from dataclasses import dataclass
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+# Frames converted to float32 at once by find_silences (~8 minutes of 30 ms frames).
+BLOCK_FRAMES = 16384
+
+
+@dataclass
+class Chunk:
+    """A slice of a talk, in seconds from the start of the original audio.
+
+    `start`/`end` include the overlap with neighbouring chunks; only segments
+    whose midpoint falls in [keep_start, keep_end) survive stitching.
+    """
+    index: int
+    start: float
+    end: float
+    keep_start: float
+    keep_end: float
+
+    def samples(self, sample_rate=SAMPLE_RATE):
+        return int(self.start * sample_rate), int(self.end * sample_rate)
+
+
+def find_silences(audio, sample_rate=SAMPLE_RATE, frame_seconds=0.03, min_silence=0.4, threshold_db=-35.0):
+    """Return (start, end) seconds of stretches quieter than `threshold_db`
+    below the talk's typical loud level (its 95th-percentile frame RMS)."""
+    frame = int(sample_rate * frame_seconds)
+    count = len(audio) // frame
+    if count == 0:
+        return []
+    rms = np.empty(count)
+    # A block of frames at a time, so memory-mapped cached audio is never
+    # converted whole.
+    for first in range(0, count, BLOCK_FRAMES):
+        last = min(count, first + BLOCK_FRAMES)
+        frames = np.asarray(audio[first * frame:last * frame], dtype=np.float32).reshape(last - first, frame)
+        rms[first:last] = np.sqrt(np.mean(frames * frames, axis=1))
+    rms += 1e-10
+    level = 20 * np.log10(rms / np.percentile(rms, 95))
+    quiet = np.concatenate(([0], (level < threshold_db).astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(quiet))
+    silences = []
+    for start, end in zip(edges[::2], edges[1::2]):
+        if (end - start) * frame_seconds >= min_silence:
+            silences.append((float(start * frame_seconds), float(end * frame_seconds)))
+    return silences
+
+
+def plan_chunks(duration, silences, target=300.0, search=60.0, overlap=1.0):
+    """Cut roughly every `target` seconds, at the longest silence within
+    `search` seconds of the ideal point (or at the ideal point if none)."""
+    cuts = []
+    previous = 0.0
+    while duration - previous > target * 1.5:
+        ideal = previous + target
+        candidates = [
+            (end - start, (start + end) / 2)
+            for start, end in silences
+            if abs((start + end) / 2 - ideal) <= search and (start + end) / 2 > previous
+        ]
+        cut = max(candidates)[1] if candidates else ideal
+        cuts.append(cut)
+        previous = cut
+    bounds = [0.0] + cuts + [duration]
+    return [
+        Chunk(
+            index=i,
+            start=max(0.0, keep_start - overlap),
+            end=min(duration, keep_end + overlap),
+            keep_start=keep_start,
+            keep_end=keep_end,
+        )
+        for i, (keep_start, keep_end) in enumerate(zip(bounds, bounds[1:]))
+    ]
+
+
+def split_audio(audio, sample_rate=SAMPLE_RATE, target=300.0, overlap=1.0):
+    """Plan chunks for decoded audio; a single chunk means it isn't worth splitting."""
+    duration = len(audio) / sample_rate
+    return plan_chunks(duration, find_silences(audio, sample_rate), target=target, overlap=overlap)
+
+
+def _normalized(text):
+    return re.sub(r"[^a-z0-9 ]", "", text.lower()).strip()
+
+
+def _shift(segment, offset):
+    segment = dict(segment)
+    segment["start"] = round(segment["start"] + offset, 3)
+    segment["end"] = round(segment["end"] + offset, 3)
+    if segment.get("words"):
+        segment["words"] = [
+            dict(word, start=round(word["start"] + offset, 3), end=round(word["end"] + offset, 3))
+            for word in segment["words"]
+        ]
+    return segment
+
+
+def stitch(chunks, results):
+    """Merge per-chunk Whisper results (in chunk order) into one result for the
+    whole talk, shifting timestamps back onto the original timeline.
+
+    Overlapping audio is transcribed twice; each segment is kept only by the
+    chunk that owns its midpoint, and a repeated sentence straddling a cut is
+    dropped the second time.
+    """
+    segments = []
+    for chunk, result in zip(chunks, results):
+        first_kept = True
+        for segment in result["segments"]:
+            segment = _shift(segment, chunk.start)
+            middle = (segment["start"] + segment["end"]) / 2
+            if not chunk.keep_start <= middle < chunk.keep_end:
+                continue
+            # Only across a cut: a talk may legitimately repeat itself elsewhere.
+            if first_kept and segments and _normalized(segment["text"]) == _normalized(segments[-1]["text"]):
+                continue
+            first_kept = False
+            segment["seek"] = int(segment["start"] * 100)
+            segment["id"] = len(segments)
+            segments.append(segment)
+    return {
+        "text": "".join(segment["text"] for segment in segments),
+        "segments": segments,
+        "language": results[0].get("language") if results else None,
+    }
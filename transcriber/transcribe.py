@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""Transcribe talks with a Whisper model that is loaded once and kept resident.
+
+Replaces the per-file `whisper` CLI loop in transcribe.sh: same output layout
+and options, but the model is initialized once for the whole run.
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import torch
+import whisper
+from whisper.audio import SAMPLE_RATE
+from whisper.utils import get_writer
+
+import dedupe
+import pcm_cache
+import segments
+import vad
+
+INPUT_DIR = "/media/biosdaddy/WD Red/archives/zuisei/audio"
+OUTPUT_DIR = "./transcriptions"
+MODEL = "turbo"  # or "medium", "large", etc.
+FORMAT = "all"
+LANGUAGE = "en"
+
+AUDIO_EXTENSIONS = (".mp3",)
+ALL_FORMATS = ("txt", "vtt", "srt", "tsv", "json")
+# Writer options the whisper CLI passes by default.
+WRITER_OPTIONS = {
+    "highlight_words": False,
+    "max_line_width": None,
+    "max_line_count": None,
+    "max_words_per_line": None,
+}
+
+
+@dataclass
+class FileResult:
+    audio_path: str
+    audio_seconds: float
+    elapsed: float
+    # Seconds actually transcribed when VAD trimming is on.
+    speech_seconds: float = None
+
+    @property
+    def rtf(self):
+        """Real-time factor: processing seconds per second of audio."""
+        return self.elapsed / self.audio_seconds if self.audio_seconds else 0.0
+
+
+def format_hms(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}h:{seconds % 3600 // 60:02d}m:{seconds % 60:02d}s"
+
+
+def expected_outputs(audio_path, output_dir, output_format):
+    stem = os.path.splitext(os.path.basename(audio_path))[0]
+    formats = ALL_FORMATS if output_format == "all" else (output_format,)
+    return [os.path.join(output_dir, f"{stem}.{fmt}") for fmt in formats]
+
+
+def vad_map_path(audio_path, output_dir):
+    stem = os.path.splitext(os.path.basename(audio_path))[0]
+    return os.path.join(output_dir, f"{stem}.vad.json")
+
+
+def has_outputs(audio_path, output_dir, output_format):
+    return all(os.path.exists(path) for path in expected_outputs(audio_path, output_dir, output_format))
+
+
+class Transcriber:
+    """A resident Whisper model plus the writer for the chosen output format."""
+
+    def __init__(self, model_name=MODEL, output_dir=OUTPUT_DIR, output_format=FORMAT,
+                 language=LANGUAGE, device=None, trim_silence=False, vad_padding=vad.PADDING,
+                 cache=None):
+        start = time.perf_counter()
+        self.model = whisper.load_model(model_name, device=device)
+        self.load_seconds = time.perf_counter() - start
+        self.model_name = model_name
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.language = language
+        self.trim_silence = trim_silence
+        self.vad_padding = vad_padding
+        self.cache = cache
+        os.makedirs(output_dir, exist_ok=True)
+        self.writer = get_writer(output_format, output_dir)
+
+    def load_audio(self, audio_path):
+        return self.cache.load(audio_path) if self.cache else whisper.load_audio(audio_path)
+
+    def transcribe_audio(self, audio):
+        return self.model.transcribe(
+            # Whisper needs the whole waveform; cached PcmAudio is converted here.
+            np.asarray(audio, dtype=np.float32),
+            language=self.language,
+            verbose=None,
+            fp16=self.model.device.type == "cuda",
+        )
+
+    def transcribe(self, audio_path, audio=None):
+        """Transcribe one file and write its outputs. `audio` may be pre-decoded 16 kHz PCM."""
+        start = time.perf_counter()
+        if audio is None:
+            audio = self.load_audio(audio_path)
+        audio_seconds = len(audio) / SAMPLE_RATE
+        offset_map = None
+        if self.trim_silence:
+            audio, offset_map = vad.trim(audio, self.vad_padding)
+        result = self.transcribe_audio(audio)
+        if offset_map:
+            vad.restore_timestamps(result, offset_map)
+            offset_map.save(vad_map_path(audio_path, self.output_dir))
+        self.writer(result, audio_path, WRITER_OPTIONS)
+        return FileResult(
+            audio_path,
+            audio_seconds,
+            time.perf_counter() - start,
+            offset_map.speech_seconds if offset_map else None,
+        )
+
+
+def probe_duration(audio_path):
+    """Audio length in seconds from ffprobe, or None if it can't be read."""
+    try:
+        completed = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", audio_path],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return float(completed.stdout.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+
+
+def probe_durations(paths, probe_workers=8):
+    with ThreadPoolExecutor(max_workers=probe_workers) as executor:
+        return dict(zip(paths, executor.map(probe_duration, paths)))
+
+
+def longest_first(paths, durations):
+    """Order files by duration, longest first, so no long talk starts last and
+    holds up the end of the run. Unprobeable files fall back to their size."""
+    return sorted(
+        paths,
+        key=lambda path: (durations.get(path) is not None, durations.get(path) or os.path.getsize(path)),
+        reverse=True,
+    )
+
+
+def iter_directory(input_dir):
+    for name in sorted(os.listdir(input_dir)):
+        if name.lower().endswith(AUDIO_EXTENSIONS):
+            yield os.path.join(input_dir, name)
+
+
+def iter_queue(queue_file):
+    """Paths from a file (or stdin for '-'), one per line, read as they arrive."""
+    f = sys.stdin if queue_file == "-" else open(queue_file, "r", encoding="utf-8")
+    try:
+        for line in f:
+            path = line.strip()
+            if path:
+                yield path
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+class RunReport:
+    """Per-file progress lines with real-time factor and an ETA.
+
+    ETA assumes the remaining files take as long per byte as the finished ones,
+    which holds well for MP3s encoded at a constant bitrate.
+    """
+
+    def __init__(self, total_files=None, total_bytes=None, workers=1):
+        self.total_files = total_files
+        self.workers = workers
+        self.total_bytes = total_bytes
+        self.start = time.perf_counter()
+        self.done_files = 0
+        self.done_bytes = 0
+        self.busy = 0.0
+        self.audio_seconds = 0.0
+
+    def file_done(self, result):
+        self.done_files += 1
+        self.done_bytes += os.path.getsize(result.audio_path)
+        self.busy += result.elapsed
+        self.audio_seconds += result.audio_seconds
+        position = f"{self.done_files}" + (f" / {self.total_files}" if self.total_files else "")
+        line = (
+            f"✅ [{position}] {os.path.basename(result.audio_path)}: "
+            f"{format_hms(result.audio_seconds)} audio in {result.elapsed:.1f}s (RTF {result.rtf:.3f})"
+        )
+        if result.speech_seconds is not None and result.audio_seconds:
+            line += f", {100 * result.speech_seconds / result.audio_seconds:.0f}% speech"
+        if self.total_bytes and self.done_bytes:
+            remaining = max(0, self.total_bytes - self.done_bytes)
+            line += f", ETA {format_hms(remaining * self.busy / self.done_bytes / self.workers)}"
+        print(line, flush=True)
+
+    def skipped(self, audio_path, reason="outputs exist"):
+        # Nothing to do for it, so it shouldn't count towards the totals or ETA.
+        if self.total_files:
+            self.total_files -= 1
+        if self.total_bytes:
+            self.total_bytes -= os.path.getsize(audio_path)
+        print(f"⏭️  skip ({reason}): {audio_path}", flush=True)
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.start
+        rtf = self.busy / self.audio_seconds if self.audio_seconds else 0.0
+        return (
+            f"✅ Done! {self.done_files} file(s), {format_hms(self.audio_seconds)} of audio "
+            f"in {format_hms(elapsed)} (overall RTF {rtf:.3f})"
+        )
+
+
+_worker = None
+
+
+def open_cache(args):
+    if not args.pcm_cache:
+        return None
+    return pcm_cache.PcmCache(args.pcm_cache, int(args.pcm_cache_gb * 1024 ** 3), args.pcm_dtype)
+
+
+def _init_worker(args):
+    global _worker
+    torch.set_num_threads(args.threads)
+    _worker = Transcriber(
+        args.model, args.output_dir, args.output_format, args.language, device="cpu",
+        trim_silence=args.vad, vad_padding=args.vad_padding, cache=open_cache(args),
+    )
+
+
+def _run_task(task):
+    """Worker side: a whole file (transcribed and written here) or one chunk of a
+    long file (result returned for the parent to stitch)."""
+    audio_path, chunk, audio = task
+    start = time.perf_counter()
+    try:
+        if chunk is None:
+            return audio_path, None, _worker.transcribe(audio_path), None
+        result = _worker.transcribe_audio(audio)
+        return audio_path, chunk, (result, time.perf_counter() - start), None
+    except Exception as exc:
+        return audio_path, chunk, None, str(exc)
+
+
+def pool_tasks(paths, args, durations, groups, slots):
+    """Yield worker tasks, splitting talks longer than --split-longer-than into
+    silence-aligned chunks so one long talk keeps every worker busy.
+
+    The pool drains this generator eagerly, so each task first takes one of
+    `slots` (released as results come back) to bound the decoded audio in flight.
+    """
+    split_seconds = args.split_longer_than * 60
+    cache = open_cache(args)
+    for audio_path in paths:
+        slots.acquire()
+        duration = durations.get(audio_path) if audio_path in durations else probe_duration(audio_path)
+        if split_seconds and duration and duration > split_seconds:
+            try:
+                audio = cache.load(audio_path) if cache else whisper.load_audio(audio_path)
+            except RuntimeError:
+                # Let the worker hit (and report) the decode error for this file alone.
+                yield audio_path, None, None
+                continue
+            audio_seconds = len(audio) / SAMPLE_RATE
+            offset_map = None
+            if args.vad:
+                audio, offset_map = vad.trim(audio, args.vad_padding)
+            chunks = segments.split_audio(
+                audio, target=args.segment_minutes * 60, overlap=args.segment_overlap
+            )
+            if len(chunks) > 1:
+                groups[audio_path] = {"chunks": chunks, "results": {}, "elapsed": 0.0,
+                                      "audio_seconds": audio_seconds, "offset_map": offset_map}
+                for i, chunk in enumerate(chunks):
+                    if i:
+                        slots.acquire()
+                    first, last = chunk.samples()
+                    yield audio_path, chunk, audio[first:last]
+                continue
+        yield audio_path, None, None
+
+
+def run_pool(paths, args, report, durations=None):
+    """Transcribe on CPU with `args.workers` processes, each holding its own model
+    and limited to `args.threads` threads, pulling one task at a time in order."""
+    # Spawned workers read these when torch is imported, before _init_worker runs.
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[name] = str(args.threads)
+    context = multiprocessing.get_context("spawn")
+    writer = get_writer(args.output_format, args.output_dir)
+    groups = {}
+    failed = set()
+    slots = threading.BoundedSemaphore(args.workers * 2)
+    with context.Pool(
+        args.workers,
+        initializer=_init_worker,
+        initargs=(args,),
+    ) as pool:
+        tasks = pool_tasks(paths, args, durations or {}, groups, slots)
+        for audio_path, chunk, outcome, error in pool.imap_unordered(_run_task, tasks, chunksize=1):
+            slots.release()
+            if error:
+                if audio_path not in failed:
+                    print(f"❌ {audio_path}: {error}", file=sys.stderr, flush=True)
+                failed.add(audio_path)
+                continue
+            if chunk is None:
+                report.file_done(outcome)
+                continue
+            group = groups[audio_path]
+            result, elapsed = outcome
+            group["results"][chunk.index] = result
+            group["elapsed"] += elapsed
+            if len(group["results"]) < len(group["chunks"]) or audio_path in failed:
+                continue
+            del groups[audio_path]
+            chunks = group["chunks"]
+            stitched = segments.stitch(chunks, [group["results"][chunk.index] for chunk in chunks])
+            offset_map = group["offset_map"]
+            if offset_map:
+                vad.restore_timestamps(stitched, offset_map)
+                offset_map.save(vad_map_path(audio_path, args.output_dir))
+            writer(stitched, audio_path, WRITER_OPTIONS)
+            report.file_done(FileResult(
+                audio_path,
+                group["audio_seconds"],
+                group["elapsed"],
+                offset_map.speech_seconds if offset_map else None,
+            ))
+    return bool(failed)
+
+
+def run_resident(paths, args, report):
+    cache = open_cache(args)
+    transcriber = Transcriber(
+        args.model, args.output_dir, args.output_format, args.language, args.device,
+        trim_silence=args.vad, vad_padding=args.vad_padding, cache=cache,
+    )
+    print(f"Model {args.model} loaded in {transcriber.load_seconds:.1f}s", flush=True)
+    if cache:
+        # Decode the next files on background threads while the model is busy.
+        decoded = pcm_cache.Prefetcher(cache, paths, args.decode_workers, args.prefetch)
+    else:
+        decoded = ((audio_path, None, None) for audio_path in paths)
+    had_error = False
+    for audio_path, audio, error in decoded:
+        try:
+            if error:
+                raise error
+            result = transcriber.transcribe(audio_path, audio)
+        except Exception as exc:
+            print(f"❌ {audio_path}: {exc}", file=sys.stderr, flush=True)
+            had_error = True
+            continue
+        report.file_done(result)
+    return had_error
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe talks with a resident Whisper model.")
+    parser.add_argument("--input-dir", default=INPUT_DIR, help="Directory of .mp3 files.")
+    parser.add_argument(
+        "--queue",
+        default=None,
+        help="Read audio paths from this file instead (one per line; '-' for stdin).",
+    )
+    parser.add_argument("--output-dir", default=OUTPUT_DIR)
+    parser.add_argument("--model", default=MODEL)
+    parser.add_argument("--output-format", default=FORMAT, choices=ALL_FORMATS + ("all",))
+    parser.add_argument("--language", default=LANGUAGE)
+    parser.add_argument("--device", default=None, help="e.g. cuda or cpu (default: cuda if available).")
+    parser.add_argument("--overwrite", action="store_true", help="Transcribe files that already have outputs.")
+    parser.add_argument(
+        "--vad",
+        action="store_true",
+        help="Transcribe only detected speech (silence, bells and room noise are cut); "
+             "timestamps still refer to the original audio.",
+    )
+    parser.add_argument(
+        "--vad-padding",
+        type=float,
+        default=vad.PADDING,
+        help="Seconds of audio kept on each side of detected speech.",
+    )
+    parser.add_argument(
+        "--pcm-cache",
+        default=None,
+        help="Directory for decoded audio, reused across runs and model sizes (keyed by MP3 hash).",
+    )
+    parser.add_argument("--pcm-cache-gb", type=float, default=20.0, help="Size limit for --pcm-cache.")
+    parser.add_argument("--pcm-dtype", choices=pcm_cache.DTYPES, default="int16")
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=4,
+        help="With --pcm-cache, files decoded ahead of the one being transcribed.",
+    )
+    parser.add_argument("--decode-workers", type=int, default=2, help="Parallel ffmpeg decodes for --prefetch.")
+    parser.add_argument(
+        "--lineage",
+        default=None,
+        help="Lineage file from `dedupe.py scan`; talks recorded as duplicates are skipped.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="CPU worker processes, each with its own model; longest files are handed out first.",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="Threads per CPU worker (default: cores / workers).",
+    )
+    parser.add_argument(
+        "--split-longer-than",
+        type=float,
+        default=20.0,
+        help="With --workers, split talks longer than this many minutes at silences "
+             "and transcribe the pieces in parallel (0 to disable).",
+    )
+    parser.add_argument("--segment-minutes", type=float, default=5.0, help="Target piece length when splitting.")
+    parser.add_argument(
+        "--segment-overlap",
+        type=float,
+        default=1.0,
+        help="Seconds of audio shared with each neighbouring piece; repeats are removed when stitching.",
+    )
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be >= 1")
+    if args.threads is None:
+        args.threads = max(1, (os.cpu_count() or 1) // args.workers)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    lineage = dedupe.FingerprintIndex(args.lineage) if args.lineage else None
+
+    def pending(paths):
+        for audio_path in paths:
+            ref_id = dedupe.ref_id_of(audio_path)
+            if lineage and lineage.is_duplicate(ref_id):
+                report.skipped(audio_path, f"duplicate of {lineage.canonical(ref_id)}")
+                continue
+            if not args.overwrite and has_outputs(audio_path, args.output_dir, args.output_format):
+                report.skipped(audio_path)
+                continue
+            yield audio_path
+
+    durations = {}
+    if args.queue:
+        report = RunReport(workers=args.workers)
+        paths = pending(iter_queue(args.queue))
+    else:
+        paths = list(iter_directory(args.input_dir))
+        report = RunReport(len(paths), sum(os.path.getsize(path) for path in paths), args.workers)
+        paths = list(pending(paths))
+        if args.workers > 1:
+            durations = probe_durations(paths)
+            paths = longest_first(paths, durations)
+
+    if args.workers > 1:
+        print(f"{args.workers} CPU workers x {args.threads} threads", flush=True)
+        had_error = run_pool(paths, args, report, durations)
+    else:
+        had_error = run_resident(paths, args, report)
+
+    print(report.summary())
+    if had_error:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
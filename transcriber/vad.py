@@ -0,0 +1,147 @@
+"""Keep only the speech in a talk before transcription, and map timestamps back.
+
+Uses webrtcvad when it is installed and falls back to the energy-based silence
+detector in segments.py otherwise. Either way it is cheap next to Whisper.
+"""
+import bisect
+import json
+from dataclasses import dataclass
+
+import numpy as np
+
+import segments
+from segments import SAMPLE_RATE
+
+try:
+    import webrtcvad
+except ImportError:  # optional dependency
+    webrtcvad = None
+
+FRAME_SECONDS = 0.03
+PADDING = 0.3
+MIN_GAP = 1.0
+MIN_SPEECH = 0.25
+
+
+def _webrtc_frames(audio, aggressiveness):
+    vad = webrtcvad.Vad(aggressiveness)
+    frame = int(SAMPLE_RATE * FRAME_SECONDS)
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+    count = len(pcm) // frame
+    return [
+        vad.is_speech(pcm[i * frame:(i + 1) * frame].tobytes(), SAMPLE_RATE)
+        for i in range(count)
+    ]
+
+
+def detect_speech(audio, aggressiveness=2):
+    """Raw (start, end) seconds of speech, before padding and merging."""
+    duration = len(audio) / SAMPLE_RATE
+    if webrtcvad is not None:
+        regions = []
+        start = None
+        for i, is_speech in enumerate(_webrtc_frames(audio, aggressiveness) + [False]):
+            if is_speech and start is None:
+                start = i * FRAME_SECONDS
+            elif not is_speech and start is not None:
+                regions.append((start, i * FRAME_SECONDS))
+                start = None
+        return regions
+    regions = []
+    previous = 0.0
+    for start, end in segments.find_silences(audio, min_silence=MIN_GAP / 2):
+        if start > previous:
+            regions.append((previous, start))
+        previous = end
+    if previous < duration:
+        regions.append((previous, duration))
+    return regions
+
+
+def speech_regions(audio, padding=PADDING, min_gap=MIN_GAP, min_speech=MIN_SPEECH):
+    """Speech regions padded by `padding`, with gaps under `min_gap` bridged
+    (short pauses are part of speaking) and blips under `min_speech` dropped."""
+    duration = len(audio) / SAMPLE_RATE
+    merged = []
+    for start, end in detect_speech(audio):
+        if end - start < min_speech:
+            continue
+        start, end = max(0.0, start - padding), min(duration, end + padding)
+        if merged and start - merged[-1][1] < min_gap:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+@dataclass
+class OffsetMap:
+    """Where each kept region of the original audio sits in the trimmed audio."""
+    trimmed_starts: list
+    original_starts: list
+    lengths: list
+    original_seconds: float
+
+    @classmethod
+    def from_regions(cls, regions, original_seconds):
+        trimmed_starts, original_starts, lengths = [], [], []
+        position = 0.0
+        for start, end in regions:
+            trimmed_starts.append(position)
+            original_starts.append(start)
+            lengths.append(end - start)
+            position += end - start
+        return cls(trimmed_starts, original_starts, lengths, original_seconds)
+
+    @property
+    def speech_seconds(self):
+        return sum(self.lengths)
+
+    def to_original(self, seconds, end=False):
+        """Map a trimmed-audio time back; an `end` on a region boundary stays in
+        the region it closes rather than jumping to the start of the next one."""
+        if not self.trimmed_starts:
+            return seconds
+        find = bisect.bisect_left if end else bisect.bisect_right
+        i = max(0, find(self.trimmed_starts, seconds) - 1)
+        offset = min(seconds - self.trimmed_starts[i], self.lengths[i])
+        return round(self.original_starts[i] + offset, 3)
+
+    def to_json(self):
+        return {
+            "original_seconds": round(self.original_seconds, 3),
+            "speech_seconds": round(self.speech_seconds, 3),
+            "regions": [
+                {"trimmed_start": round(t, 3), "original_start": round(o, 3), "length": round(n, 3)}
+                for t, o, n in zip(self.trimmed_starts, self.original_starts, self.lengths)
+            ],
+        }
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, indent=2)
+            f.write("\n")
+
+
+def trim(audio, padding=PADDING):
+    """Return (speech-only audio, OffsetMap). Audio with no detected speech is kept whole."""
+    original_seconds = len(audio) / SAMPLE_RATE
+    regions = speech_regions(audio, padding=padding)
+    if not regions:
+        regions = [(0.0, original_seconds)]
+    pieces = [audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)] for start, end in regions]
+    # Lengths from the actual sample counts so the map matches the audio exactly.
+    regions = [(start, start + len(piece) / SAMPLE_RATE) for (start, _), piece in zip(regions, pieces)]
+    return np.concatenate(pieces), OffsetMap.from_regions(regions, original_seconds)
+
+
+def restore_timestamps(result, offset_map):
+    """Rewrite a Whisper result's segment and word times onto the original audio."""
+    for segment in result["segments"]:
+        segment["start"] = offset_map.to_original(segment["start"])
+        segment["end"] = offset_map.to_original(segment["end"], end=True)
+        for word in segment.get("words") or []:
+            word["start"] = offset_map.to_original(word["start"])
+            word["end"] = offset_map.to_original(word["end"], end=True)
+        segment["seek"] = int(segment["start"] * 100)
+    return result